@@ -1,3 +1,5 @@
+from bitglitter.config.migrations import migrate_database
+migrate_database()
 from bitglitter.config.defaultdbdata import load_default_db_data
 load_default_db_data()
 
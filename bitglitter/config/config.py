@@ -1,12 +1,30 @@
-from sqlalchemy import Column, create_engine, Integer
+from sqlalchemy import Column, create_engine, event, Integer
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import QueuePool
 
 from pathlib import Path
 
+# How long a connection waits on another process's write lock before giving up with "database is locked".
+SQLITE_BUSY_TIMEOUT_MILLISECONDS = 30000
+
 engine = create_engine(f'sqlite:///{Path(__file__).resolve().parent / "config.sqlite3"}?check_same_thread=False',
-                       poolclass=NullPool)
+                       poolclass=QueuePool)
+
+
+@event.listens_for(engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Write-ahead logging lets readers carry on while a frame batch is being committed, and makes each commit
+    cheaper.  With it, syncing to disk on checkpoints rather than every commit is still safe from corruption.
+    """
+
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MILLISECONDS}')
+    cursor.close()
+
+
 engine.connect()
 Session = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
 session = Session()
@@ -38,4 +56,20 @@ class SQLBaseClass(Base):
         session.commit()
 
 
+def release_connections_before_fork():
+    """Ran in the parent right before worker processes are started, so no connection is in use while they're forked.
+    Objects loaded in the session stay loaded.
+    """
+
+    session.commit()
+
+
+def database_worker_initializer():
+    """Ran once as each worker process starts.  SQLite connections can't be shared across processes, so the pool
+    inherited from the parent is dropped without closing its connections, and the worker opens and reuses its own.
+    """
+
+    engine.dispose(close=False)
+
+
 SQLBaseClass.metadata.create_all(engine)
@@ -1,19 +1,22 @@
 from bitglitter.config.config import session
-from bitglitter.config.configmodels import Config, Constants, Statistics
+from bitglitter.config.configmodels import CodecStatistics, Config, Constants, Statistics
 from bitglitter.config.defaultdbdata import load_default_db_data
 from bitglitter.config.palettemodels import Palette
 from bitglitter.config.presetmodels import Preset
+from bitglitter.config.readmodels.payloadstore import remove_payload_stores
 from bitglitter.config.readmodels.streamread import StreamRead
 from bitglitter.config.readmodels.readmodels import StreamDataProgress, StreamFile, StreamFrame, StreamSHA256Blacklist
 
 
 def remove_session():
     """Resets persistent data to factory default settings."""
-    model_list = [Config, Constants, Palette, Preset, Statistics, StreamDataProgress, StreamFile, StreamFrame,
-                  StreamRead, StreamSHA256Blacklist]
+    model_list = [CodecStatistics, Config, Constants, Palette, Preset, Statistics, StreamDataProgress, StreamFile,
+                  StreamFrame, StreamRead, StreamSHA256Blacklist]
+    store_locations = session.query(StreamRead.payload_store_directory, StreamRead.stream_sha256).all()
     for model in model_list:
         session.query(model).delete()
     session.commit()
+    remove_payload_stores(store_locations)
     load_default_db_data()
 
 
@@ -24,12 +27,13 @@ def return_settings():
             config.write_path, 'log_txt_path': config.log_txt_dir, 'log_output': config.log_output,
             'maximum_cpu_cores': config.maximum_cpu_cores, 'save_statistics': config.save_statistics,
             'output_stream_title': config.output_stream_title, 'MAX_SUPPORTED_CPU_CORES':
-            config.MAX_SUPPORTED_CPU_CORES, 'logging_level': config.logging_level}
+            config.MAX_SUPPORTED_CPU_CORES, 'logging_level': config.logging_level,
+            'payload_store_path': config.payload_store_path}
 
 
 def update_settings(read_path=None, read_bad_frame_strikes=None, disable_bad_frame_strikes=None,
                     write_path=None, log_txt_path=None, log_output=None, logging_level=None, maximum_cpu_cores=None,
-                    save_statistics=None, output_stream_title=None):
+                    save_statistics=None, output_stream_title=None, payload_store_path=None):
     config = session.query(Config).first()
     if read_path:
         config.read_path = read_path
@@ -51,19 +55,26 @@ def update_settings(read_path=None, read_bad_frame_strikes=None, disable_bad_fra
         config.save_statistics = save_statistics
     if output_stream_title:
         config.output_stream_title = output_stream_title
+    if payload_store_path:
+        config.payload_store_path = payload_store_path
     config.save()
 
 
 def output_stats():
     """Returns a dictionary object containing read and write statistics."""
     stats = session.query(Statistics).first()
-    return stats.return_stats()
+    returned_stats = stats.return_stats()
+    returned_stats['codec_decode_rates'] = {codec_stats.codec: codec_stats.return_stats() for codec_stats in
+                                            session.query(CodecStatistics).all()}
+    return returned_stats
 
 
 def clear_stats():
     """Resets all write and read values back to zero."""
     stats = session.query(Statistics).first()
     stats.clear_stats()
+    session.query(CodecStatistics).delete()
+    session.commit()
 
 
 def write_stats_update(blocks, frames, data):
@@ -75,3 +86,10 @@ def write_stats_update(blocks, frames, data):
 def read_stats_update(blocks, frames, data):
     stats = session.query(Statistics).first()
     stats.read_update(blocks, frames, data)
+
+
+def codec_stats_update(codec, frames_read, frames_failed):
+    codec_stats = session.query(CodecStatistics).filter(CodecStatistics.codec == codec).first()
+    if not codec_stats:
+        codec_stats = CodecStatistics.create(codec=codec)
+    codec_stats.read_update(frames_read, frames_failed)
@@ -4,6 +4,7 @@ from multiprocessing import cpu_count
 from pathlib import Path
 
 from bitglitter.config.config import engine, session, SQLBaseClass
+from bitglitter.config.readmodels.payloadstore import DEFAULT_PAYLOAD_STORE_DIRECTORY
 
 
 class Config(SQLBaseClass):
@@ -14,6 +15,7 @@ class Config(SQLBaseClass):
     enable_bad_frame_strikes = Column(Boolean, default=True)
     write_path = Column(String, default=str(Path(__file__).resolve().parent.parent / 'Write Output'))
     log_txt_dir = Column(String, default=str(Path(__file__).resolve().parent.parent / 'Logs'))
+    payload_store_path = Column(String, default=str(DEFAULT_PAYLOAD_STORE_DIRECTORY))
     log_output = Column(Boolean, default=False)
     logging_level = Column(Integer, default=1)
     maximum_cpu_cores = Column(Integer, default=cpu_count())
@@ -68,11 +70,12 @@ class Statistics(SQLBaseClass):
         self.data_wrote_bits += data
         self.save()
 
-    def read_update(self, blocks, frames, data):
+    def read_update(self, blocks, frames, data, save=True):
         self.blocks_read += blocks
         self.frames_read += frames
         self.data_read_bits += data
-        self.save()
+        if save:
+            self.save()
 
     def return_stats(self):
         return {
@@ -91,6 +94,25 @@ class Statistics(SQLBaseClass):
         self.save()
 
 
+class CodecStatistics(SQLBaseClass):
+    """Tracks how reliably frames decode from each video codec read, identified by the fourcc in the video file."""
+    __abstract__ = False
+    __tablename__ = 'codec_statistics'
+    codec = Column(String, unique=True, nullable=False)
+    frames_read = Column(Integer, default=0)
+    frames_failed = Column(Integer, default=0)
+
+    def read_update(self, frames_read, frames_failed):
+        self.frames_read += frames_read
+        self.frames_failed += frames_failed
+        self.save()
+
+    def return_stats(self):
+        decode_success_rate = round(1 - (self.frames_failed / self.frames_read), 4) if self.frames_read else None
+        return {'frames_read': self.frames_read, 'frames_failed': self.frames_failed, 'decode_success_rate':
+                decode_success_rate}
+
+
 class CurrentJobState(SQLBaseClass):
     """Lightweight singleton object that is queried for every frame read or written when ran with Electron app, to
     indicate if the current job has been cancelled.  This runs at the beginning of each frame.
@@ -0,0 +1,67 @@
+import logging
+from pathlib import Path
+
+from bitglitter.config.config import engine
+# StreamRead has to be imported first, as the tables in readmodels reference its table
+from bitglitter.config.readmodels.streamread import StreamRead
+from bitglitter.config.readmodels.readmodels import StreamDataProgress, StreamFile, StreamFrame
+from bitglitter.config.readmodels.payloadstore import DEFAULT_PAYLOAD_STORE_DIRECTORY
+
+# create_all() only creates missing tables, so databases made by an older version are brought up to date here.  The
+# version a database is at is kept in SQLite's user_version pragma.
+
+
+def _return_columns(connection, table_name):
+    return [row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info({table_name})')]
+
+
+def _migrate_to_version_1(connection):
+    """Adds StreamFile.compression_codec, which records the codec each file of a stream was compressed with."""
+
+    if 'compression_codec' not in _return_columns(connection, 'stream_files'):
+        connection.exec_driver_sql('ALTER TABLE stream_files ADD COLUMN compression_codec VARCHAR')
+
+
+def _migrate_to_version_2(connection):
+    """Adds the indexes of the read tables.  Duplicate frames have to be removed before the unique index on stream_id
+    and frame_number can be created.
+    """
+
+    connection.exec_driver_sql('DELETE FROM stream_frames WHERE id NOT IN (SELECT MIN(id) FROM stream_frames GROUP BY '
+                               'stream_id, frame_number)')
+    for model in [StreamDataProgress, StreamFile, StreamFrame, StreamRead]:
+        for index in model.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _migrate_to_version_3(connection):
+    """Adds the payload store directory to the config, and to each stream read.  Stores of streams started before this
+    were kept in the package directory, and are left there.
+    """
+
+    if 'payload_store_path' not in _return_columns(connection, 'config'):
+        connection.exec_driver_sql('ALTER TABLE config ADD COLUMN payload_store_path VARCHAR')
+    connection.exec_driver_sql('UPDATE config SET payload_store_path = ? WHERE payload_store_path IS NULL',
+                               (str(DEFAULT_PAYLOAD_STORE_DIRECTORY),))
+
+    if 'payload_store_directory' not in _return_columns(connection, 'stream_reads'):
+        connection.exec_driver_sql('ALTER TABLE stream_reads ADD COLUMN payload_store_directory VARCHAR')
+    package_store_directory = Path(__file__).resolve().parent.parent / 'Payload Stores'
+    connection.exec_driver_sql('UPDATE stream_reads SET payload_store_directory = ? WHERE payload_store_directory IS '
+                               'NULL', (str(package_store_directory),))
+
+
+MIGRATIONS = [_migrate_to_version_1, _migrate_to_version_2, _migrate_to_version_3]
+
+
+def migrate_database():
+    """Runs every migration the database hasn't had yet, in order.  Migrations are written so they can also run on a
+    database that create_all() has just made.
+    """
+
+    with engine.begin() as connection:
+        schema_version = connection.exec_driver_sql('PRAGMA user_version').scalar()
+        for version, migration in enumerate(MIGRATIONS[schema_version:], start=schema_version + 1):
+            logging.debug(f'Migrating database to version {version}...')
+            migration(connection)
+            connection.exec_driver_sql(f'PRAGMA user_version = {version}')
@@ -6,7 +6,7 @@ import time
 
 from bitglitter.config.config import engine, SQLBaseClass
 from bitglitter.utilities.palette import BitsToColor, ColorsToBits, convert_hex_to_rgb, get_color_distance, \
-    get_palette_id_from_hash
+    get_palette_id_from_hash, return_color_table
 
 
 class Palette(SQLBaseClass):
@@ -107,6 +107,10 @@ class Palette(SQLBaseClass):
         color_set_tupled = self.convert_colors_to_tuple()
         return BitsToColor(color_set_tupled, self.bit_length, self.name)
 
+    def return_color_table(self):
+        """Only the color table of the encoder, for when the full dictionary isn't needed."""
+        return return_color_table(self.convert_colors_to_tuple(), self.bit_length)
+
     def return_decoder(self):
         color_set_tupled = self.convert_colors_to_tuple()
         return ColorsToBits(color_set_tupled, self.bit_length, self.name)
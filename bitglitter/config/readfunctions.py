@@ -7,6 +7,7 @@ import cv2
 from bitglitter.config.config import session
 from bitglitter.config.configmodels import Constants
 from bitglitter.config.palettemodels import Palette
+from bitglitter.config.readmodels.payloadstore import remove_payload_stores
 from bitglitter.config.readmodels.readmodels import StreamFrame, StreamSHA256Blacklist
 from bitglitter.config.readmodels.streamread import StreamRead
 from bitglitter.read.decode.headerdecode import initializer_header_validate_decode, metadata_header_validate_decode
@@ -122,8 +123,10 @@ def remove_partial_save(stream_sha256):
 
 def remove_all_partial_save_data():
     """Removes all data for partial saves, both files and metadata within some internal classes."""
+    store_locations = session.query(StreamRead.payload_store_directory, StreamRead.stream_sha256).all()
     session.query(StreamRead).delete()
     session.commit()
+    remove_payload_stores(store_locations)
     return True
 
 
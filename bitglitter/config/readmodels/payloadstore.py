@@ -0,0 +1,65 @@
+import math
+import os
+from pathlib import Path
+
+# Payload stores can run to several GB, so by default they're kept in the user's home directory rather than the
+# package's.  This is changed with update_settings(payload_store_path=...), and applies to streams started afterwards.
+DEFAULT_PAYLOAD_STORE_DIRECTORY = Path.home() / '.bitglitter' / 'Payload Stores'
+
+
+class PayloadStore:
+    """Decoded frame payloads of a stream are kept in their own file rather than in the database, which only keeps the
+    frame index.  Each frame has a fixed size slot in the file based on its frame number, large enough for a standard
+    payload frame.  This way frames can be written in any order and from any process without coordinating with each
+    other, and the frames a file spans can be read back as a single range of bytes.  Slots of frames that haven't been
+    read yet are left as holes in the file.
+    """
+
+    def __init__(self, store_directory, stream_sha256, payload_bits_per_standard_frame):
+        self.store_path = return_payload_store_path(store_directory, stream_sha256)
+        self.slot_size = math.ceil(payload_bits_per_standard_frame / 8)
+
+    def can_store(self, payload_bit_length):
+        return payload_bit_length <= self.slot_size * 8
+
+    def write_frame(self, frame_number, payload_bytes):
+        os.makedirs(self.store_path.parent, exist_ok=True)
+
+        # Opened without truncating, since other processes may be writing their own frames into it at the same time
+        file_descriptor = os.open(self.store_path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+        try:
+            os.lseek(file_descriptor, (frame_number - 1) * self.slot_size, os.SEEK_SET)
+            payload_view = memoryview(payload_bytes)
+            while payload_view:
+                payload_view = payload_view[os.write(file_descriptor, payload_view):]
+        finally:
+            os.close(file_descriptor)
+
+    def read_frames(self, first_frame, last_frame):
+        """Returns the slots of first_frame through last_frame (inclusive) in one read."""
+
+        read_size = (last_frame - first_frame + 1) * self.slot_size
+        if not self.store_path.exists():
+            return bytes(read_size)
+        with open(self.store_path, 'rb') as store:
+            store.seek((first_frame - 1) * self.slot_size)
+            return store.read(read_size).ljust(read_size, b'\x00')
+
+
+def return_payload_store_path(store_directory, stream_sha256):
+    return Path(store_directory) / f'{stream_sha256}.bin'
+
+
+def remove_payload_store(store_directory, stream_sha256):
+    store_path = return_payload_store_path(store_directory, stream_sha256)
+    if store_path.exists():
+        os.remove(store_path)
+
+
+def remove_payload_stores(store_locations):
+    """Takes (store_directory, stream_sha256) pairs.  Only the stores themselves are removed, as the directory is set by
+    the user and may hold other files.
+    """
+
+    for store_directory, stream_sha256 in store_locations:
+        remove_payload_store(store_directory, stream_sha256)
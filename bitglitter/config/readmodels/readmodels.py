@@ -1,5 +1,5 @@
-from bitstring import BitStream
-from sqlalchemy import BLOB, Boolean, Column, ForeignKey, Integer, String
+from sqlalchemy import BLOB, Boolean, Column, ForeignKey, Index, Integer, String
+from sqlalchemy.dialects.sqlite import insert
 
 import logging
 import math
@@ -7,61 +7,91 @@ import os
 from pathlib import Path
 
 from bitglitter.config.config import session, SQLBaseClass
-from bitglitter.utilities.compression import decompress_file
+from bitglitter.config.readmodels.payloadstore import PayloadStore
+from bitglitter.utilities.bitpacking import BitRangeWriter
+from bitglitter.utilities.compression import decompress_file, is_compression_codec_available
 from bitglitter.utilities.cryptography import decrypt_file, get_hash_from_file
 from bitglitter.utilities.filemanipulation import refresh_directory
 
+# How much of the payload store is read at once during extraction.
+EXTRACT_READ_SIZE_BYTES = 16777216
+
+
+def return_frame_bit_index(frame_number, payload_bits, payload_start_frame, payload_first_frame_bits,
+                           payload_bits_per_standard_frame, total_frames, payload_size_in_bytes):
+    """Returns the start and ending index positions of the greater stream payload, used when calculating progress to
+    tell what specific data is inside of a given frame.
+    """
+
+    if frame_number == payload_start_frame:
+        return 0, payload_first_frame_bits - 1
+    elif frame_number == total_frames:
+        padding = -1 * ((payload_size_in_bytes * 8) - payload_first_frame_bits - payload_bits -
+                        (payload_bits_per_standard_frame * (total_frames - payload_start_frame - 1)))
+        bit_start = (payload_size_in_bytes * 8) - (payload_bits + 1)
+        return bit_start, bit_start + (payload_bits - padding)
+    else:
+        bit_start = (payload_bits_per_standard_frame * (frame_number - payload_start_frame - 1)) + \
+                    payload_first_frame_bits
+        return bit_start, bit_start + payload_bits - 1
+
 
 class StreamFrame(SQLBaseClass):
     __tablename__ = 'stream_frames'
     __abstract__ = False
+    __table_args__ = (
+        Index('ix_stream_frames_stream_id_frame_number', 'stream_id', 'frame_number', unique=True),
+        Index('ix_stream_frames_stream_id_is_complete', 'stream_id', 'is_complete'),
+    )
 
     # note- sha256 not included as its only verification prior to addition
     stream_id = Column(Integer, ForeignKey('stream_reads.id', ondelete='CASCADE'))
     payload_bits = Column(Integer)  # Length of stream payload bits within this frame, tracked to ensure padding removed
-    payload = Column(BLOB)
+    payload = Column(BLOB)  # Only used if the payload couldn't go in the stream's PayloadStore
     frame_number = Column(Integer)
     is_complete = Column(Boolean, default=False)
     added_to_progress = Column(Boolean, default=False)
 
-    def get_bit_index(self, payload_start_frame, payload_first_frame_bits, payload_bits_per_standard_frame,
-                      total_frames, payload_size_in_bytes):
-        """Returns the start and ending index positions of the greater stream payload, used when calculating progress
-        to tell what specific data is inside of a given frame.
+    @classmethod
+    def create_if_new(cls, stream_id, frame_number):
+        """Creates the frame and returns it, or returns None if it already exists.  The unique index on stream_id and
+        frame_number makes this safe when several processes come across the same frame at once.
         """
 
-        if self.frame_number == payload_start_frame:
-            return 0, payload_first_frame_bits - 1
-        elif self.frame_number == total_frames:
-            padding = -1 * ((payload_size_in_bytes * 8) - payload_first_frame_bits - self.payload_bits -
-                            (payload_bits_per_standard_frame * (total_frames - payload_start_frame - 1)))
-            bit_start = (payload_size_in_bytes * 8) - (self.payload_bits + 1)
-            return bit_start, bit_start + (self.payload_bits - padding)
-        else:
-            bit_start = (payload_bits_per_standard_frame * (self.frame_number - payload_start_frame - 1)) + \
-                        payload_first_frame_bits
-            return bit_start, bit_start + self.payload_bits - 1
+        result = session.execute(insert(cls).values(stream_id=stream_id, frame_number=frame_number)
+                                 .on_conflict_do_nothing(index_elements=['stream_id', 'frame_number']))
+        session.commit()
+        if not result.rowcount:
+            return None
+        return session.get(cls, result.inserted_primary_key[0])
 
-    def progress_calculated(self):
-        """Was used with StreamDataProgress to calculate progress, and doesn't have to be used again."""
-        self.added_to_progress = True
-        self.save()
+    def get_bit_index(self, payload_start_frame, payload_first_frame_bits, payload_bits_per_standard_frame,
+                      total_frames, payload_size_in_bytes):
+        return return_frame_bit_index(self.frame_number, self.payload_bits, payload_start_frame,
+                                      payload_first_frame_bits, payload_bits_per_standard_frame, total_frames,
+                                      payload_size_in_bytes)
+
+    def return_payload_bit_range(self, local_start_position=0, local_end_position=None):
+        """Returns the start and length of a range of this frame's payload bits, by default all of them.
+        local_end_position is inclusive.
+        """
 
-    def return_partial_frame_payload(self, local_start_position, local_end_position=None):
-        bits = BitStream(self.payload).read(self.payload_bits)
-        bits.pos = local_start_position
         if local_end_position:
-            return bits.read(local_end_position - local_start_position + 1)
+            return local_start_position, local_end_position - local_start_position + 1
         else:
-            return bits.read(bits.len - local_start_position)
+            return local_start_position, self.payload_bits - local_start_position
 
-    def return_full_frame_payload(self):
-        return BitStream(self.payload).read(self.payload_bits)
+    def return_payload_bytes(self, stored_bytes):
+        """stored_bytes is this frame's slot from the stream's PayloadStore, used unless the payload is in the db."""
+        return self.payload if self.payload is not None else stored_bytes
 
-    def finalize_frame(self, payload_bits=None):
-        if payload_bits:
+    def finalize_frame(self, payload_bits=None, payload_store=None):
+        if payload_bits is not None and payload_bits.len:  # An all zero BitStream is falsy, so its length is checked
             self.payload_bits = payload_bits.len
-            self.payload = payload_bits.tobytes()
+            if payload_store and payload_store.can_store(payload_bits.len):
+                payload_store.write_frame(self.frame_number, payload_bits.tobytes())
+            else:
+                self.payload = payload_bits.tobytes()
         else:
             self.added_to_progress = True  # Removing empty frames from upcoming calculation
         self.is_complete = True
@@ -74,6 +104,10 @@ class StreamFrame(SQLBaseClass):
 class StreamFile(SQLBaseClass):
     __tablename__ = 'stream_files'
     __abstract__ = False
+    __table_args__ = (
+        Index('ix_stream_files_stream_id_is_eligible_is_processed', 'stream_id', 'is_eligible', 'is_processed'),
+        Index('ix_stream_files_stream_id_start_bit_position', 'stream_id', 'start_bit_position'),
+    )
 
     stream_id = Column(Integer, ForeignKey('stream_reads.id', ondelete='CASCADE'))
     sequence = Column(Integer)
@@ -87,6 +121,7 @@ class StreamFile(SQLBaseClass):
     raw_file_hash = Column(String)
     processed_file_size_bytes = Column(Integer)
     processed_file_hash = Column(String)
+    compression_codec = Column(String)  # Only set if compressed with something other than zlib
 
     def __str__(self):
         return f'File {self.name} in {self.stream}'
@@ -131,52 +166,51 @@ class StreamFile(SQLBaseClass):
         advanced_state = {'stream_id': self.stream_id, 'sequence': self.sequence, 'start_bit_position':
                           self.start_bit_position, 'end_bit_position': self.end_bit_position, 'is_processed':
                           self.is_processed, 'is_eligible': self.is_eligible, 'processed_file_size_bytes':
-                          self.processed_file_size_bytes, 'processed_file_hash': self.processed_file_hash}
+                          self.processed_file_size_bytes, 'processed_file_hash': self.processed_file_hash,
+                          'compression_codec': self.compression_codec}
 
         return basic_state | advanced_state if advanced else basic_state
 
-    def _extract_frame_generator(self, first_frame, first_frame_index, last_frame, last_frame_index):
-
-        first_returned_frame = StreamFrame.query.filter(StreamFrame.stream_id == self.stream_id) \
-            .filter(StreamFrame.frame_number == first_frame).first()
-
-        # 1 frame
-        if first_frame == last_frame:
-            yield first_returned_frame.return_partial_frame_payload(first_frame_index, last_frame_index)
-
-        # 2+ frames
-        elif last_frame > first_frame:
-            # First frame
-            yield first_returned_frame.return_partial_frame_payload(first_frame_index)
-
-            # Middle frames
-            mid_frame_minimum = first_frame + 1
-            mid_frame_maximum = last_frame - 1
-            last_consecutive_frame_number = first_returned_frame.frame_number
-            # Getting groups of 100 frames
-            if last_frame - first_frame > 1:
-                for query_group in range(math.ceil((mid_frame_maximum - mid_frame_minimum + 1) / 100)):
-                    query_minimum = mid_frame_minimum + (query_group * 100)
-                    query_maximum = query_minimum + 99 if query_minimum + 99 <= mid_frame_maximum else mid_frame_maximum
-                    frames = StreamFrame.query.filter(StreamFrame.stream_id == self.stream_id) \
-                        .filter(StreamFrame.frame_number >= query_minimum) \
-                        .filter(StreamFrame.frame_number <= query_maximum) \
-                        .order_by(StreamFrame.frame_number.asc())
-
-                    for frame in frames:
-                        assert frame.frame_number - 1 == last_consecutive_frame_number
-                        last_consecutive_frame_number += 1
-
-                        yield frame.return_full_frame_payload()
-
-            # Last frame
-            last_returned_frame = StreamFrame.query.filter(StreamFrame.stream_id == self.stream_id) \
-                .filter(StreamFrame.frame_number == last_frame).first()
-            yield last_returned_frame.return_partial_frame_payload(0, last_frame_index)
+    def _extract_frame_generator(self, first_frame, first_frame_index, last_frame, last_frame_index, payload_store):
+        """Yields the source bytes of each frame the file spans, along with the start and length of the file's bits
+        within them.  Frames are read from the payload store a group at a time, each group being a single read.
+        """
+
+        frames_per_read = max(1, EXTRACT_READ_SIZE_BYTES // payload_store.slot_size)
+        last_consecutive_frame_number = first_frame - 1
+
+        for group_first_frame in range(first_frame, last_frame + 1, frames_per_read):
+            group_last_frame = min(group_first_frame + frames_per_read - 1, last_frame)
+            frames = StreamFrame.query.filter(StreamFrame.stream_id == self.stream_id) \
+                .filter(StreamFrame.frame_number >= group_first_frame) \
+                .filter(StreamFrame.frame_number <= group_last_frame) \
+                .order_by(StreamFrame.frame_number.asc())
+            group_bytes = memoryview(payload_store.read_frames(group_first_frame, group_last_frame))
+
+            for frame in frames:
+                assert frame.frame_number - 1 == last_consecutive_frame_number
+                last_consecutive_frame_number += 1
+
+                slot_start = (frame.frame_number - group_first_frame) * payload_store.slot_size
+                frame_bytes = frame.return_payload_bytes(group_bytes[slot_start:slot_start + payload_store.slot_size])
+
+                # 1 frame
+                if first_frame == last_frame:
+                    yield (frame_bytes, *frame.return_payload_bit_range(first_frame_index, last_frame_index))
+
+                # 2+ frames
+                elif frame.frame_number == first_frame:
+                    yield (frame_bytes, *frame.return_payload_bit_range(first_frame_index))
+                elif frame.frame_number == last_frame:
+                    yield (frame_bytes, *frame.return_payload_bit_range(0, last_frame_index))
+                else:
+                    yield (frame_bytes, *frame.return_payload_bit_range())
+
+        assert last_consecutive_frame_number == last_frame
 
     def extract(self, payload_start_frame, payload_first_frame_bits, payload_bits_per_standard_frame,
                 encryption_enabled, compression_enabled, decryption_key, scrypt_n, scrypt_r, scrypt_p,
-                temp_save_directory):
+                temp_save_directory, stream_key_salt=None, encryption_version=1):
         raw_path = Path(self.save_path)
         logging.info(f'Extracting {raw_path.name} ...')
         returned_results = self.return_state(advanced=False)
@@ -208,15 +242,14 @@ class StreamFile(SQLBaseClass):
         # File assembly
         os.makedirs(raw_path.parent, exist_ok=True)
         assemble_path = raw_path if not self.processed_file_size_bytes else temp_save_directory / 'processing.bin'
+        payload_store = PayloadStore(self.stream.payload_store_directory, self.stream.stream_sha256,
+                                     payload_bits_per_standard_frame)
         with open(assemble_path, 'wb') as file_writer:
-            buffer = BitStream()
-            for frame_data in self._extract_frame_generator(first_frame, first_frame_index, last_frame,
-                                                            last_frame_index):
-                buffer += frame_data
-                max_allowable_read = (buffer.len // 8) * 8
-                to_write = buffer.read(max_allowable_read).tobytes()
-                file_writer.write(to_write)
-                buffer = buffer.read(buffer.len - max_allowable_read)
+            bit_range_writer = BitRangeWriter(file_writer)
+            for frame_bytes, bit_start, bit_length in self._extract_frame_generator(first_frame, first_frame_index,
+                                                                                    last_frame, last_frame_index,
+                                                                                    payload_store):
+                bit_range_writer.write_bits(frame_bytes, bit_start, bit_length)
 
         # Post-assembly integrity check if compression and/or encryption enabled on stream
         if self.processed_file_size_bytes:
@@ -227,12 +260,20 @@ class StreamFile(SQLBaseClass):
                 returned_results['results'] = 'Internal assembly error'
                 return returned_results
 
+        compression_codec = self.compression_codec if self.compression_codec else 'zlib'
+        if compression_enabled and not is_compression_codec_available(compression_codec):
+            logging.warning(f'{raw_path.name} is compressed with {compression_codec}, which requires the zstandard '
+                            f'package to be installed.  Skipping...')
+            returned_results['results'] = 'Missing compression codec'
+            return returned_results
+
         if encryption_enabled:
             if compression_enabled:  # Decrypt + decompress
                 decrypt_path = assemble_path.parent / 'decrypted.bin'
                 try:
-                    decrypt_file(assemble_path, decrypt_path, decryption_key, scrypt_n, scrypt_r, scrypt_p)
-                    decompress_file(decrypt_path, self.save_path)
+                    decrypt_file(assemble_path, decrypt_path, decryption_key, scrypt_n, scrypt_r, scrypt_p,
+                                 stream_key_salt=stream_key_salt, encryption_version=encryption_version)
+                    decompress_file(decrypt_path, self.save_path, codec=compression_codec)
                     calculated_hash = get_hash_from_file(self.save_path)
                     if calculated_hash != self.raw_file_hash:
                         logging.warning('Post-decryption/decompression SHA-256 failure, aborting...')
@@ -245,14 +286,15 @@ class StreamFile(SQLBaseClass):
 
             else:  # Decryption only
                 try:
-                    decrypt_file(assemble_path, self.save_path, decryption_key, scrypt_n, scrypt_r, scrypt_p)
+                    decrypt_file(assemble_path, self.save_path, decryption_key, scrypt_n, scrypt_r, scrypt_p,
+                                 stream_key_salt=stream_key_salt, encryption_version=encryption_version)
                 except ValueError:
                     logging.warning('Incorrect decryption values, aborting unpackaging of this stream...')
                     returned_results['results'] = 'Cannot decrypt'
                     return returned_results
 
         elif compression_enabled:  # Just decompression
-            decompress_file(assemble_path, self.save_path)
+            decompress_file(assemble_path, self.save_path, codec=compression_codec)
             calculated_hash = get_hash_from_file(self.save_path)
             if calculated_hash != self.raw_file_hash:
                 logging.warning('Post-decompression SHA-256 failure, aborting...')
@@ -283,6 +325,9 @@ class StreamDataProgress(SQLBaseClass):
 
     __tablename__ = 'stream_data_progress'
     __abstract__ = False
+    __table_args__ = (
+        Index('ix_stream_data_progress_stream_id_bit_start_position', 'stream_id', 'bit_start_position'),
+    )
 
     stream_id = Column(Integer, ForeignKey('stream_reads.id', ondelete='CASCADE'))
     bit_start_position = Column(Integer)
@@ -292,44 +337,6 @@ class StreamDataProgress(SQLBaseClass):
         return f'Progress slice for {self.stream.stream_name} - bit pos [{self.bit_start_position}:' \
                f'{self.bit_end_position}]'
 
-    @classmethod
-    def create(cls, stream_id, bit_start_position, bit_end_position, **kwargs):
-        """Before an object is created, checking to see if an adjacent payload frame has already been read.  Rather than
-        making a new object, the old instance will 'pool' the new edges together.
-        """
-
-        identical_progress = session.query(StreamDataProgress).filter(StreamDataProgress.stream_id == stream_id) \
-            .filter(StreamDataProgress.bit_end_position == bit_end_position) \
-            .filter(StreamDataProgress.bit_start_position == bit_start_position).first()
-        if identical_progress:
-            return
-
-        previous_progress = session.query(StreamDataProgress).filter(StreamDataProgress.stream_id == stream_id) \
-            .filter(StreamDataProgress.bit_end_position == bit_start_position - 1).first()
-        if previous_progress:
-            previous_progress.bit_end_position = bit_end_position
-            previous_progress.save()
-
-        next_progress = session.query(StreamDataProgress).filter(StreamDataProgress.stream_id == stream_id) \
-            .filter(StreamDataProgress.bit_start_position == bit_end_position + 1).first()
-        if next_progress:
-            if previous_progress:
-                previous_progress.bit_end_position = next_progress.bit_end_position
-                previous_progress.save()
-                next_progress.delete()
-            else:
-                next_progress.bit_start_position = bit_start_position
-                next_progress.save()
-
-        if previous_progress or next_progress:
-            return
-
-        # Repopulating kwargs to send them off to super() for creation
-        kwargs['stream_id'] = stream_id
-        kwargs['bit_start_position'] = bit_start_position
-        kwargs['bit_end_position'] = bit_end_position
-        super().create(**kwargs)
-
 
 class StreamSHA256Blacklist(SQLBaseClass):
     """This model holds the SHA-256 of a stream you want to avoid reading and decoding."""
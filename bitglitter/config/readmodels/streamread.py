@@ -6,14 +6,21 @@ from sqlalchemy.orm import relationship
 
 import json
 import logging
-import math
 from pathlib import Path
 import time
 
 from bitglitter.config.config import engine, SQLBaseClass, session
+from bitglitter.config.configmodels import Config
 from bitglitter.config.palettemodels import Palette
-from bitglitter.config.readmodels.readmodels import StreamFrame, StreamFile, StreamDataProgress
+from bitglitter.config.readmodels.payloadstore import PayloadStore, remove_payload_store
+from bitglitter.config.readmodels.readmodels import return_frame_bit_index, StreamFrame, StreamFile, \
+    StreamDataProgress
 from bitglitter.read.decode.manifest import manifest_unpack
+from bitglitter.read.process_state.completedframes import CompletedFrames
+from bitglitter.utilities.intervalset import IntervalSet
+
+# Files flagged as eligible per update, keeping under SQLite's limit on bound parameters.
+ELIGIBILITY_UPDATE_CHUNK_SIZE = 900
 
 
 class StreamRead(SQLBaseClass):
@@ -41,6 +48,7 @@ class StreamRead(SQLBaseClass):
     size_in_bytes = Column(Integer)
     output_directory = Column(String)
     manifest_string = Column(String)
+    payload_store_directory = Column(String)  # Set from the config as the stream is started
 
     # Header Management
     carry_over_header_bytes = Column(BLOB)
@@ -94,6 +102,12 @@ class StreamRead(SQLBaseClass):
     files = relationship('StreamFile', backref='stream', cascade='all,delete-orphan', lazy='dynamic')
     progress = relationship('StreamDataProgress', backref='stream', cascade='all,delete-orphan', lazy='dynamic')
 
+    @classmethod
+    def create(cls, **kwargs):
+        """The stream keeps the payload store directory it started with, so changing the setting doesn't lose it."""
+        kwargs.setdefault('payload_store_directory', session.query(Config).first().payload_store_path)
+        return super().create(**kwargs)
+
     def __str__(self):
         if self.stream_name:
             return f'"{self.stream_name}" | {self.stream_sha256}'
@@ -311,40 +325,66 @@ class StreamRead(SQLBaseClass):
         # Bypass these calculations
         if self.all_frames_accounted_for:
             if not self.progress_complete:
-                self.progress.delete()
-                self.frames.update({StreamFrame.added_to_progress: True})
-                StreamDataProgress.create(self.id, 0, (self.size_in_bytes * 8) - 1)
+                self._save_progress(IntervalSet([(0, (self.size_in_bytes * 8) - 1)]))
                 self.progress_complete = True
+            self.files.filter(StreamFile.is_eligible == False).update({StreamFile.is_eligible: True})
 
         # Incomplete stream, calculating progress
         elif self.highest_processed_frame and self.manifest_string:
-            logging.info('Calculating progress... this might take some time for longer streams with high frame counts.')
-            for index_range in range(math.ceil(self.highest_processed_frame / 100)):
-                frame_group = StreamFrame.query.filter(StreamFrame.frame_number < (index_range + 1) * 100) \
-                    .filter(StreamFrame.frame_number >= index_range * 100).filter(StreamFrame.stream_id == self.id) \
-                    .filter(StreamFrame.added_to_progress == False)
-                for frame in frame_group:
-                    bit_start, bit_end = frame.get_bit_index(self.payload_start_frame, self.payload_first_frame_bits,
-                                                             self.payload_bits_per_standard_frame, self.total_frames,
-                                                             self.size_in_bytes)
-                    StreamDataProgress.create(self.id, bit_start, bit_end)
-                    frame.progress_calculated()
-
-        # What files are eligible to be unpackaged that 'fit' inside of the finished data
-        if self.all_frames_accounted_for:
-            self.files.filter(StreamFile.is_eligible == False) \
-                .update({StreamFile.is_eligible: True})
-        else:
-            for progress_cluster in self.progress:
-                self.files.filter(StreamFile.is_eligible == False)\
-                    .filter(StreamFile.is_processed == False) \
-                    .filter(StreamFile.start_bit_position >= progress_cluster.bit_start_position) \
-                    .filter(StreamFile.end_bit_position <= progress_cluster.bit_end_position) \
-                    .update({StreamFile.is_eligible: True})
+            logging.info('Calculating progress...')
+            progress = IntervalSet((progress_cluster.bit_start_position, progress_cluster.bit_end_position)
+                                   for progress_cluster in self.progress)
+            new_frames = session.query(StreamFrame.frame_number, StreamFrame.payload_bits) \
+                .filter(StreamFrame.stream_id == self.id).filter(StreamFrame.added_to_progress == False) \
+                .filter(StreamFrame.payload_bits != None).all()
+            if new_frames:
+                for frame_number, payload_bits in new_frames:
+                    progress.add(*return_frame_bit_index(frame_number, payload_bits, self.payload_start_frame,
+                                                         self.payload_first_frame_bits,
+                                                         self.payload_bits_per_standard_frame, self.total_frames,
+                                                         self.size_in_bytes))
+                self._save_progress(progress)
+            self._flag_eligible_files(progress)
 
         self.toggle_eligibility_calculations(False)
         return {}
 
+    def _save_progress(self, progress):
+        """Replaces the stream's saved progress with the ranges of the IntervalSet, and flags every read frame as added
+        to it.
+        """
+
+        self.progress.delete(synchronize_session=False)
+        session.add_all([StreamDataProgress(stream_id=self.id, bit_start_position=bit_start, bit_end_position=bit_end)
+                         for bit_start, bit_end in progress])
+        self.frames.filter(StreamFrame.added_to_progress == False) \
+            .update({StreamFrame.added_to_progress: True}, synchronize_session=False)
+
+    def _flag_eligible_files(self, progress):
+        """Flags files that fall entirely within the read progress as eligible, with a single sweep over the files and
+        progress ranges, both sorted by where they start.
+        """
+
+        pending_files = session.query(StreamFile.id, StreamFile.start_bit_position, StreamFile.end_bit_position) \
+            .filter(StreamFile.stream_id == self.id).filter(StreamFile.is_eligible == False) \
+            .filter(StreamFile.is_processed == False).order_by(StreamFile.start_bit_position).all()
+        progress_ranges = list(progress)
+        range_index = 0
+        eligible_file_ids = []
+        for file_id, start_bit_position, end_bit_position in pending_files:
+            while range_index < len(progress_ranges) and progress_ranges[range_index][1] < start_bit_position:
+                range_index += 1
+            if range_index == len(progress_ranges):
+                break
+            bit_start, bit_end = progress_ranges[range_index]
+            if bit_start <= start_bit_position and end_bit_position <= bit_end:
+                eligible_file_ids.append(file_id)
+
+        for chunk_start in range(0, len(eligible_file_ids), ELIGIBILITY_UPDATE_CHUNK_SIZE):
+            session.query(StreamFile) \
+                .filter(StreamFile.id.in_(eligible_file_ids[chunk_start:chunk_start + ELIGIBILITY_UPDATE_CHUNK_SIZE])) \
+                .update({StreamFile.is_eligible: True}, synchronize_session=False)
+
     def attempt_unpackage(self, temp_save_directory):
         """Attempts to extract files from the partial or complete decoded data.  Returns a dictionary object giving a
         summary of the results.
@@ -360,13 +400,23 @@ class StreamRead(SQLBaseClass):
         # File extract
         pending_extraction = self.files.filter(StreamFile.is_eligible == True).filter(StreamFile.is_processed == False)
 
+        # Files in streams with a stream key salt have their keys derived from a single stream key
+        stream_key_salt = None
+        encryption_version = 1
+        if self.encryption_enabled:
+            manifest_dict = json.loads(self.manifest_string)
+            if 'ks' in manifest_dict:
+                stream_key_salt = bytes.fromhex(manifest_dict['ks'])
+            if 'ev' in manifest_dict:
+                encryption_version = manifest_dict['ev']
+
         returned_list = []
         extracted_file_count = 0
         for file in pending_extraction:
             extract_results = file.extract(self.payload_start_frame, self.payload_first_frame_bits,
                                            self.payload_bits_per_standard_frame, self.encryption_enabled,
                                            self.compression_enabled, self.decryption_key, self.scrypt_n, self.scrypt_r,
-                                           self.scrypt_p, temp_save_directory)
+                                           self.scrypt_p, temp_save_directory, stream_key_salt, encryption_version)
             returned_list.append(extract_results)
             if extract_results['results'] == 'Success':
                 extracted_file_count += 1
@@ -383,6 +433,22 @@ class StreamRead(SQLBaseClass):
 
         return returned_list, extracted_file_count
 
+    def return_payload_store(self):
+        """Frame payloads can only be stored once the size of a standard frame is known, from the stream palette."""
+        if self.payload_bits_per_standard_frame:
+            return PayloadStore(self.payload_store_directory, self.stream_sha256,
+                                self.payload_bits_per_standard_frame)
+        return None
+
+    def return_completed_frames(self):
+        frame_numbers = session.query(StreamFrame.frame_number).filter(StreamFrame.stream_id == self.id) \
+            .filter(StreamFrame.is_complete == True)
+        return CompletedFrames(frame_number for frame_number, in frame_numbers)
+
+    def delete(self):
+        remove_payload_store(self.payload_store_directory, self.stream_sha256)
+        super().delete()
+
     def autodelete_attempt(self):
         if self.auto_delete_finished_stream and self.is_complete:
             logging.info(f'All files have been extracted.  Deleting {self}...')
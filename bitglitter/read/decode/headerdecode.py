@@ -7,7 +7,7 @@ from bitglitter.config.configmodels import Constants
 from bitglitter.config.palettemodels import Palette
 from bitglitter.read.decode.headerutilities import crc_verify
 from bitglitter.utilities.compression import decompress_bytes
-from bitglitter.utilities.cryptography import decrypt_bytes, get_sha256_hash_from_bytes
+from bitglitter.utilities.cryptography import decrypt_header_bytes, get_sha256_hash_from_bytes
 
 
 def initializer_header_validate_decode(bit_stream, block_height_estimate, block_width_estimate):
@@ -138,7 +138,7 @@ def metadata_header_validate_decode(header_bytes, read_sha256, crypto_key, encry
     #  Attempt decryption if encryption enabled
     decrypted_bytes = None
     if encryption_enabled and file_mask_enabled:
-        decrypted_bytes = decrypt_bytes(header_bytes, crypto_key, scrypt_n, scrypt_r, scrypt_p)
+        decrypted_bytes = decrypt_header_bytes(header_bytes, crypto_key, scrypt_n, scrypt_r, scrypt_p)
         if decrypted_bytes:
             logging.info('Successful decryption.')
         else:  # Signalling there was a decryption failure
@@ -0,0 +1,33 @@
+class CompletedFrames:
+    """A bitmap of a stream's completed frame numbers, one bit per frame.  It's loaded once as multicore reading starts
+    and sent to each worker, so workers can drop frames that are already complete right after decoding the frame header,
+    without asking the database.  Workers add the frames they decode themselves, which catches repeated frames too.
+    """
+
+    def __init__(self, frame_numbers=()):
+        self.bitmap = bytearray()
+        for frame_number in frame_numbers:
+            self.add(frame_number)
+
+    def __contains__(self, frame_number):
+        byte_index = frame_number >> 3
+        return byte_index < len(self.bitmap) and bool(self.bitmap[byte_index] & (1 << (frame_number & 7)))
+
+    def add(self, frame_number):
+        byte_index = frame_number >> 3
+        if byte_index >= len(self.bitmap):
+            self.bitmap.extend(bytes(byte_index - len(self.bitmap) + 1))
+        self.bitmap[byte_index] |= 1 << (frame_number & 7)
+
+
+_worker_completed_frames = {}
+
+
+def completed_frames_worker_initializer(completed_frames):
+    """Ran once as each read worker starts, or as it starts on a partition of the video."""
+    _worker_completed_frames['completed_frames'] = completed_frames
+
+
+def return_worker_completed_frames():
+    """Returns this worker's CompletedFrames, or None outside of a multicore read."""
+    return _worker_completed_frames.get('completed_frames')
@@ -3,20 +3,46 @@ from sqlalchemy.exc import InvalidRequestError
 import logging
 from multiprocessing import cpu_count, Pool
 from pathlib import Path
+from threading import Event
 
+from bitglitter.config.config import database_worker_initializer, release_connections_before_fork
+from bitglitter.config.configfunctions import codec_stats_update
 from bitglitter.config.palettemodels import Palette
 from bitglitter.config.readmodels.streamread import StreamRead
-from bitglitter.read.process_state.videoframegenerator import video_frame_generator
+from bitglitter.read.process_state.videoframegenerator import return_video_codec, return_video_partitions, \
+    video_frame_generator
+from bitglitter.read.process_state.completedframes import completed_frames_worker_initializer
 from bitglitter.read.process_state.imageframeprocessor import ImageFrameProcessor
 from bitglitter.read.process_state.multiprocess_state_generator import image_state_generator, video_state_generator
+from bitglitter.read.process_state.sharedframering import SharedFrameRing, shared_frame_worker_initializer
 from bitglitter.read.process_state.videoframeprocessor import VideoFrameProcessor
-from bitglitter.utilities.read import flush_inactive_frames
+from bitglitter.read.process_state.videopartitionprocessor import video_partition_processor
+from bitglitter.utilities.read import flush_inactive_frames, FrameResultWriter
+
+# With partitioned video reads, the remaining frames are split into this many ranges per worker, so a slow range
+# doesn't leave the other workers idle near the end.
+VIDEO_PARTITIONS_PER_WORKER = 4
+
+
+def _video_worker_initializer(frame_ring_arguments, completed_frames):
+    """Ran once as each video read worker starts."""
+
+    shared_frame_worker_initializer(*frame_ring_arguments)
+    completed_frames_worker_initializer(completed_frames)
+
+
+def _save_codec_statistics(save_statistics, video_codec, video_frames_read, video_frames_failed):
+    """Recorded at each exit of a video read, so codecs that fail often show up in the statistics."""
+
+    if save_statistics and video_frames_read:
+        codec_stats_update(video_codec, video_frames_read, video_frames_failed)
 
 
 def frame_read_handler(input_path, output_directory, input_type, bad_frame_strikes, max_cpu_cores,
                        block_height_override, block_width_override, decryption_key, scrypt_n, scrypt_r, scrypt_p,
                        temp_save_directory, stop_at_metadata_load, auto_unpackage_stream, auto_delete_finished_stream,
-                       save_statistics, valid_image_formats):
+                       save_statistics, valid_image_formats, partitioned_video_read=False,
+                       skip_repeated_frames=True):
     logging.info(f'Processing {input_path}...')
 
     #  Initializing variables that will be in all frame_process() calls
@@ -54,8 +80,10 @@ def frame_read_handler(input_path, output_directory, input_type, bad_frame_strik
     frame_read_results = {'active_sessions_this_stream': []}
 
     if input_type == 'video':
-
-        frame_generator = video_frame_generator(input_path)
+        video_codec = return_video_codec(input_path)
+        video_frames_read = 0
+        video_frames_failed = 0
+        frame_generator = video_frame_generator(input_path, skip_repeated_frames)
         total_video_frames = next(frame_generator)
         initial_state_dict['total_frames'] = total_video_frames
         logging.info(f'{total_video_frames} frame(s) detected in video file.')
@@ -64,6 +92,7 @@ def frame_read_handler(input_path, output_directory, input_type, bad_frame_strik
         # Processing frames in a single process until all metadata has been received, then switch to multicore
         logging.info('Starting single core sequential decoding until metadata captured...')
         for frame_data in frame_generator:
+            frame_shape = frame_data['frame'].shape
             initial_state_dict['frame'] = frame_data['frame']
             initial_state_dict['current_frame_position'] = frame_data['current_frame_position']
             video_frame_processor = VideoFrameProcessor(initial_state_dict)
@@ -72,18 +101,22 @@ def frame_read_handler(input_path, output_directory, input_type, bad_frame_strik
             if video_frame_processor.skip_process:
                 frame_read_results['active_sessions_this_stream'].append(video_frame_processor.stream_sha256)
                 break
+            video_frames_read += 1
 
             # Errors
             if 'error' in video_frame_processor.frame_errors:
+                video_frames_failed += 1
                 # Session-ending error, such as a metadata frame being corrupted
                 if 'fatal' in video_frame_processor.frame_errors:
                     logging.warning('Cannot continue.')
+                    _save_codec_statistics(save_statistics, video_codec, video_frames_read, video_frames_failed)
                     return {'error': True}
                 if bad_frame_strikes:  # Corrupted frame, skipping to next one
                     frame_strikes_this_session += 1
                     logging.warning(f'Bad frame strike {frame_strikes_this_session}/{bad_frame_strikes}')
                     if frame_strikes_this_session >= bad_frame_strikes:
                         logging.warning('Reached frame strike limit.  Aborting...')
+                        _save_codec_statistics(save_statistics, video_codec, video_frames_read, video_frames_failed)
                         return {'error': True}
 
             if frame_data['current_frame_position'] == 1:
@@ -92,6 +125,7 @@ def frame_read_handler(input_path, output_directory, input_type, bad_frame_strik
 
             # Metadata return
             if video_frame_processor.metadata and stream_read.stop_at_metadata_load:
+                _save_codec_statistics(save_statistics, video_codec, video_frames_read, video_frames_failed)
                 return {'metadata': video_frame_processor.metadata}
 
             # Stream palette load
@@ -109,24 +143,89 @@ def frame_read_handler(input_path, output_directory, input_type, bad_frame_strik
                     .append(video_frame_processor.stream_read.stream_sha256)
                 break
 
-        # Begin multicore frame decode
+        # Frames already complete are sent to the workers once, so they can skip them without the database
         if not video_frame_processor.skip_process:
-            with Pool(processes=cpu_pool_size) as worker_pool:
-                logging.info(f'Metadata headers fully decoded, now decoding on {cpu_pool_size} CPU core(s)...')
-                for multicore_read_results in worker_pool.imap(VideoFrameProcessor,
-                                                           video_state_generator(frame_generator, stream_read,
-                                                           save_statistics, initializer_palette_a,
-                                                           initializer_palette_a_dict, initializer_palette_a_color_set,
-                                                           total_video_frames, stream_palette, stream_palette_dict,
-                                                           stream_palette_color_set)):
-
-                    if 'error' in multicore_read_results.frame_errors:
-                        if bad_frame_strikes:  # Corrupted frame, skipping to next one
-                            frame_strikes_this_session += 1
+            completed_frames = stream_read.return_completed_frames()
+
+        # Partitioned multicore decode, where each worker opens the video itself and decodes its own frame ranges
+        if not video_frame_processor.skip_process and partitioned_video_read:
+            partitions = return_video_partitions(frame_data['current_frame_position'] + 1, total_video_frames,
+                                                 cpu_pool_size * VIDEO_PARTITIONS_PER_WORKER)
+            partition_states = [{'input_path': input_path, 'first_frame_position': first_frame_position,
+                                 'last_frame_position': last_frame_position, 'stream_read': stream_read,
+                                 'save_statistics': save_statistics, 'initializer_palette_a':
+                                 initializer_palette_a, 'initializer_palette_a_dict': initializer_palette_a_dict,
+                                 'initializer_palette_a_color_set': initializer_palette_a_color_set,
+                                 'total_frames': total_video_frames, 'stream_palette': stream_palette,
+                                 'stream_palette_dict': stream_palette_dict, 'stream_palette_color_set':
+                                 stream_palette_color_set, 'bad_frame_strikes': bad_frame_strikes,
+                                 'completed_frames': completed_frames, 'skip_repeated_frames':
+                                 skip_repeated_frames}
+                                for first_frame_position, last_frame_position in partitions]
+
+            release_connections_before_fork()
+            frame_result_writer = FrameResultWriter()
+            try:
+                with Pool(processes=cpu_pool_size, initializer=database_worker_initializer) as worker_pool:
+                    logging.info(f'Metadata headers fully decoded, now decoding {len(partitions)} partition(s) of'
+                                 f' the video on {cpu_pool_size} CPU core(s)...')
+                    for partition_results in worker_pool.imap_unordered(video_partition_processor,
+                                                                        partition_states):
+                        for frame_results in partition_results['frame_results']:
+                            frame_result_writer.add(frame_results)
+                        video_frames_read += partition_results['frames_read']
+                        video_frames_failed += partition_results['frames_failed']
+                        if partition_results['frames_failed'] and bad_frame_strikes:
+                            frame_strikes_this_session += partition_results['frames_failed']
                             logging.warning(f'Bad frame strike {frame_strikes_this_session}/{bad_frame_strikes}')
                             if frame_strikes_this_session >= bad_frame_strikes:
                                 logging.warning('Reached frame strike limit.  Aborting...')
+                                _save_codec_statistics(save_statistics, video_codec, video_frames_read,
+                                                       video_frames_failed)
                                 return {'error': True}
+            finally:
+                frame_result_writer.close()
+
+        # Begin multicore frame decode.  Frames are handed to the workers through shared memory rather than
+        # pickled, so decoding in the parent isn't held up by it.
+        elif not video_frame_processor.skip_process:
+            frame_ring = SharedFrameRing(cpu_pool_size * 2, frame_shape)
+            ring_stopped = Event()
+            try:
+                release_connections_before_fork()
+                with Pool(processes=cpu_pool_size, initializer=_video_worker_initializer,
+                          initargs=(frame_ring.return_worker_arguments(), completed_frames)) as worker_pool:
+                    logging.info(f'Metadata headers fully decoded, now decoding on {cpu_pool_size} CPU core(s)...')
+                    frame_states = video_state_generator(frame_generator, stream_read, save_statistics,
+                                                         initializer_palette_a, initializer_palette_a_dict,
+                                                         initializer_palette_a_color_set, total_video_frames,
+                                                         stream_palette, stream_palette_dict,
+                                                         stream_palette_color_set, frame_ring, ring_stopped)
+                    frame_result_writer = FrameResultWriter()
+                    try:
+                        for multicore_read_results in worker_pool.imap(VideoFrameProcessor, frame_states):
+                            frame_ring.release_slot(multicore_read_results.frame_slot)
+                            frame_result_writer.add(multicore_read_results.frame_results)
+
+                            video_frames_read += 1
+                            if 'error' in multicore_read_results.frame_errors:
+                                video_frames_failed += 1
+                                if bad_frame_strikes:  # Corrupted frame, skipping to next one
+                                    frame_strikes_this_session += 1
+                                    logging.warning(f'Bad frame strike {frame_strikes_this_session}/'
+                                                    f'{bad_frame_strikes}')
+                                    if frame_strikes_this_session >= bad_frame_strikes:
+                                        logging.warning('Reached frame strike limit.  Aborting...')
+                                        _save_codec_statistics(save_statistics, video_codec, video_frames_read,
+                                                               video_frames_failed)
+                                        return {'error': True}
+                    finally:
+                        ring_stopped.set()
+                        frame_result_writer.close()
+            finally:
+                frame_ring.close()
+
+        _save_codec_statistics(save_statistics, video_codec, video_frames_read, video_frames_failed)
 
     elif input_type == 'image':
 
@@ -146,7 +245,8 @@ def frame_read_handler(input_path, output_directory, input_type, bad_frame_strik
         # Begin multicore frame decode
         image_metadata_checkpoint_data = None
         image_strike_limit_hit = False
-        with Pool(processes=cpu_pool_size) as worker_pool:
+        release_connections_before_fork()
+        with Pool(processes=cpu_pool_size, initializer=database_worker_initializer) as worker_pool:
             logging.info(f'Decoding on {cpu_pool_size} CPU core(s)...')
             for multicore_read_results in worker_pool.imap(ImageFrameProcessor, image_state_generator(input_list,
                                                                                                   initial_state_dict)):
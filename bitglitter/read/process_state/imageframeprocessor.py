@@ -1,14 +1,16 @@
 from bitstring import BitStream
+from sqlalchemy.exc import IntegrityError
 
 import logging
 
+from bitglitter.config.config import session
 from bitglitter.config.configfunctions import read_stats_update
 from bitglitter.config.palettefunctions import import_custom_palette_from_header
 from bitglitter.config.readmodels.streamread import StreamRead
 from bitglitter.config.readmodels.readmodels import StreamFrame, StreamSHA256Blacklist
 from bitglitter.read.decode.headerdecode import custom_palette_header_validate_decode, frame_header_decode, \
     initializer_header_validate_decode, metadata_header_validate_decode, stream_header_decode
-from bitglitter.read.scan.scanvalidate import frame_lock_on, geometry_override_checkpoint
+from bitglitter.read.scan.scanvalidate import cached_frame_lock_on, geometry_override_checkpoint
 from bitglitter.read.scan.scanhandler import ScanHandler
 from bitglitter.utilities.cryptography import get_sha256_hash_from_bytes
 
@@ -94,6 +96,7 @@ class ImageFrameProcessor:
         self._metadata_checkpoint()
         self._run_statistics()
         self.scan_handler = None  # Keep as is, multiprocessing cannot return its internal generator and crashes
+        self.frame = None  # Not sent back to the parent with the results
         logging.debug('Frame decode cycle complete.')
 
     def _initial_frame_setup(self):
@@ -109,11 +112,12 @@ class ImageFrameProcessor:
             self.frame_errors = self.ERROR_SOFT
             return
 
-        # Frame lock on
-        lock_on_results = frame_lock_on(self.frame, self.block_height_override, self.block_width_override,
-                                        self.frame_pixel_height, self.frame_pixel_width,
-                                        self.initializer_palette_a_color_set, self.initializer_palette_b_color_set,
-                                        self.initializer_palette_a_dict, self.initializer_palette_b_dict)
+        # Frame lock on, reusing the geometry of earlier images of the same size when their calibrators agree
+        lock_on_results = cached_frame_lock_on(self.frame, self.block_height_override, self.block_width_override,
+                                               self.frame_pixel_height, self.frame_pixel_width,
+                                               self.initializer_palette_a_color_set,
+                                               self.initializer_palette_b_color_set, self.initializer_palette_a_dict,
+                                               self.initializer_palette_b_dict)
         if not lock_on_results:
             self.frame_errors = self.ERROR_SOFT
             return
@@ -181,18 +185,23 @@ class ImageFrameProcessor:
 
         else:
             logging.info(f'New stream: {self.stream_sha256}')
-            self.stream_read = StreamRead.create(stream_sha256=self.stream_sha256, stream_is_video=False,
-                                                 protocol_version=protocol_version, output_directory=
-                                                 self.output_directory, decryption_key=self.decryption_key, scrypt_n=
-                                                 self.scrypt_n, scrypt_r=self.scrypt_r, scrypt_p=self.scrypt_p,
-                                                 auto_delete_finished_stream=self.auto_delete_finished_stream,
-                                                 stop_at_metadata_load=self.stop_at_metadata_load,
-                                                 palette_header_complete=self.palette_header_complete,
-                                                 auto_unpackage_stream=self.auto_unpackage_stream, block_height=
-                                                 self.block_height, block_width=self.block_width, pixel_width=
-                                                 self.pixel_width, stream_palette_id=self.stream_palette_id,
-                                                 custom_palette_used=custom_palette_used, custom_palette_loaded=
-                                                 custom_palette_loaded)
+            try:
+                self.stream_read = StreamRead.create(stream_sha256=self.stream_sha256, stream_is_video=False,
+                                                     protocol_version=protocol_version, output_directory=
+                                                     self.output_directory, decryption_key=self.decryption_key,
+                                                     scrypt_n=self.scrypt_n, scrypt_r=self.scrypt_r, scrypt_p=
+                                                     self.scrypt_p, auto_delete_finished_stream=
+                                                     self.auto_delete_finished_stream, stop_at_metadata_load=
+                                                     self.stop_at_metadata_load, palette_header_complete=
+                                                     self.palette_header_complete, auto_unpackage_stream=
+                                                     self.auto_unpackage_stream, block_height=self.block_height,
+                                                     block_width=self.block_width, pixel_width=self.pixel_width,
+                                                     stream_palette_id=self.stream_palette_id, custom_palette_used=
+                                                     custom_palette_used, custom_palette_loaded=custom_palette_loaded)
+            except IntegrityError:  # Another process read a frame of this stream and created it first
+                session.rollback()
+                self.stream_read = StreamRead.query.filter(StreamRead.stream_sha256 == self.stream_sha256).first()
+                logging.info(f'Existing stream read found: {self.stream_read}')
             if self.stream_palette:
                 self.stream_read.stream_palette_load(self.stream_palette)
 
@@ -242,10 +251,11 @@ class ImageFrameProcessor:
                 return
 
         # Checking if frame exists
-        self.stream_frame = StreamFrame.query.filter(StreamFrame.stream_id == self.stream_read.id) \
-            .filter(StreamFrame.frame_number == self.frame_number).first()
-        if self.stream_frame:  # Frame already loaded, skipping
-            if self.stream_frame.is_complete:  # Current frame is fully validated and saved
+        self.stream_frame = StreamFrame.create_if_new(self.stream_read.id, self.frame_number)
+        if not self.stream_frame:  # Frame already loaded, skipping
+            existing_frame = StreamFrame.query.filter(StreamFrame.stream_id == self.stream_read.id) \
+                .filter(StreamFrame.frame_number == self.frame_number).first()
+            if existing_frame and existing_frame.is_complete:  # Current frame is fully validated and saved
                 logging.info(f'Frame {self.frame_number} is already complete')
             else:  # Current frame is being actively processed by another process
                 logging.debug(f'Pending active frame in another process: {self.frame_number}')
@@ -253,7 +263,6 @@ class ImageFrameProcessor:
             self.frame_blocks_left = False
             return
         else:  # New frame
-            self.stream_frame = StreamFrame.create(stream_id=self.stream_read.id, frame_number=self.frame_number)
             logging.debug(f'New frame: #{self.frame_number}')
             self.is_unique_frame = True
 
@@ -471,7 +480,8 @@ class ImageFrameProcessor:
 
             # Marking frame as complete, moving on to next frame
             if self.payload_in_frame:
-                self.stream_frame.finalize_frame(self.stream_payload_bits)
+                self.stream_frame.finalize_frame(self.stream_payload_bits,
+                                                self.stream_read.return_payload_store())
 
                 # First frame with payload in it
                 if self.setup_headers_end_this_frame:
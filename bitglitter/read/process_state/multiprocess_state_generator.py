@@ -7,8 +7,10 @@ from pathlib import Path
 
 def video_state_generator(video_frame_generator, stream_read, save_statistics, initializer_palette,
                           initializer_palette_dict, initializer_color_set, total_video_frames, stream_palette=None,
-                          stream_palette_dict=None, stream_palette_color_set=None):
-    """Returns a dict object for frame_process to use when switching to multiprocessing"""
+                          stream_palette_dict=None, stream_palette_color_set=None, frame_ring=None, ring_stopped=None):
+    """Returns a dict object for frame_process to use when switching to multiprocessing.  With a frame ring, frames
+    are copied into its shared memory and only their slot is passed along.
+    """
 
     if not stream_palette:
         stream_palette = Palette.query.filter(Palette.palette_id == stream_read.stream_palette_id).first()
@@ -16,12 +18,20 @@ def video_state_generator(video_frame_generator, stream_read, save_statistics, i
         stream_palette_color_set = stream_palette.convert_colors_to_tuple()
 
     for returned_state in video_frame_generator:
-        yield {'mode': 'video', 'stream_read': stream_read, 'frame': returned_state['frame'], 'save_statistics':
-               save_statistics, 'initializer_palette_a': initializer_palette, 'initializer_palette_a_dict':
-               initializer_palette_dict, 'initializer_palette_a_color_set': initializer_color_set,
-               'current_frame_position': returned_state['current_frame_position'], 'total_frames': total_video_frames,
-               'stream_palette': stream_palette, 'stream_palette_dict': stream_palette_dict,
-               'stream_palette_color_set': stream_palette_color_set, 'sequential': False}
+        frame = returned_state['frame']
+        frame_slot = None
+        if frame_ring and frame_ring.fits_frame(frame):
+            frame_slot = frame_ring.write_frame(frame, ring_stopped)
+            if frame_slot is None:
+                return
+            frame = None
+
+        yield {'mode': 'video', 'stream_read': stream_read, 'frame': frame, 'frame_slot': frame_slot,
+               'save_statistics': save_statistics, 'initializer_palette_a': initializer_palette,
+               'initializer_palette_a_dict': initializer_palette_dict, 'initializer_palette_a_color_set':
+               initializer_color_set, 'current_frame_position': returned_state['current_frame_position'],
+               'total_frames': total_video_frames, 'stream_palette': stream_palette, 'stream_palette_dict':
+               stream_palette_dict, 'stream_palette_color_set': stream_palette_color_set, 'sequential': False}
 
 
 def image_state_generator(input_list, initial_state_dict):
@@ -0,0 +1,73 @@
+import numpy
+
+from multiprocessing import shared_memory
+import queue
+
+from bitglitter.config.config import database_worker_initializer
+
+
+class SharedFrameRing:
+    """A fixed number of frame sized slots in shared memory, used to hand decoded video frames to the read workers.
+    The parent copies each frame into a free slot and only sends the slot's index through the pool, rather than
+    pickling the whole frame.  A slot is released back to the ring once its frame's results are returned, which also
+    caps how many frames are in flight at once.
+    """
+
+    def __init__(self, slot_count, frame_shape):
+        self.slot_count = slot_count
+        self.frame_shape = tuple(frame_shape)
+        self.shared_memory = shared_memory.SharedMemory(create=True, size=int(numpy.prod(self.frame_shape)) *
+                                                        slot_count)
+        self.slots = numpy.ndarray((slot_count, *self.frame_shape), dtype=numpy.uint8, buffer=self.shared_memory.buf)
+        self.free_slots = queue.Queue()
+        for slot in range(slot_count):
+            self.free_slots.put(slot)
+
+    def return_worker_arguments(self):
+        """Arguments for shared_frame_worker_initializer(), so workers can attach to the ring."""
+        return self.shared_memory.name, self.slot_count, self.frame_shape
+
+    def fits_frame(self, frame):
+        return frame is not None and frame.shape == self.frame_shape and frame.dtype == numpy.uint8
+
+    def write_frame(self, frame, ring_stopped):
+        """Copies the frame into the next free slot and returns its index, waiting for one if they're all in use.
+        Returns None if ring_stopped is set while waiting.
+        """
+
+        while True:
+            try:
+                slot = self.free_slots.get(timeout=1)
+                break
+            except queue.Empty:
+                if ring_stopped.is_set():
+                    return None
+        self.slots[slot] = frame
+        return slot
+
+    def release_slot(self, slot):
+        if slot is not None:
+            self.free_slots.put(slot)
+
+    def close(self):
+        del self.slots
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+
+_worker_frame_ring = {}
+
+
+def shared_frame_worker_initializer(shared_memory_name, slot_count, frame_shape):
+    """Ran once as each read worker starts, attaching it to the parent's frame ring."""
+
+    database_worker_initializer()
+    attached_memory = shared_memory.SharedMemory(name=shared_memory_name)
+    _worker_frame_ring['shared_memory'] = attached_memory
+    _worker_frame_ring['slots'] = numpy.ndarray((slot_count, *frame_shape), dtype=numpy.uint8,
+                                                buffer=attached_memory.buf)
+
+
+def return_shared_frame(slot):
+    """Returns the frame in the slot, as a view into shared memory.  It is only valid until the slot is released."""
+    return _worker_frame_ring['slots'][slot]
@@ -1,15 +1,109 @@
 import cv2
+import numpy
 
+import logging
 
-def video_frame_generator(video_input_path):
+# Screen recordings of playback hold each frame for several captured frames.  A frame is treated as a repeat of the
+# one before it if, once both are shrunk down to this size, no pixel differs by more than
+# REPEATED_FRAME_MAX_DIFFERENCE in any channel.  This compares cells rather than the frame's average, so two frames
+# that differ only in a few blocks aren't mistaken for each other.
+REPEATED_FRAME_FINGERPRINT_SIZE = (160, 90)
+REPEATED_FRAME_MAX_DIFFERENCE = 4
+
+
+def return_frame_fingerprint(frame):
+    """Returns a cheap fingerprint of the frame, a shrunken copy of it."""
+    return cv2.resize(frame, REPEATED_FRAME_FINGERPRINT_SIZE, interpolation=cv2.INTER_AREA).astype(numpy.int16)
+
+
+def is_repeated_frame(fingerprint, previous_fingerprint):
+    return previous_fingerprint is not None and \
+           int(numpy.abs(fingerprint - previous_fingerprint).max()) <= REPEATED_FRAME_MAX_DIFFERENCE
+
+
+def _skip_repeated_frames(frame_states):
+    """Drops frames that repeat the one right before them, before they go through the rest of the read process."""
+
+    previous_fingerprint = None
+    repeated_frames = 0
+    for frame_state in frame_states:
+        if frame_state['frame'] is not None:
+            fingerprint = return_frame_fingerprint(frame_state['frame'])
+            if is_repeated_frame(fingerprint, previous_fingerprint):
+                repeated_frames += 1
+                logging.debug(f'Video frame {frame_state["current_frame_position"]} repeats the frame before it, '
+                              f'skipping...')
+                continue
+            previous_fingerprint = fingerprint
+        yield frame_state
+    if repeated_frames:
+        logging.info(f'{repeated_frames} repeated video frame(s) skipped.')
+
+
+def video_frame_generator(video_input_path, skip_repeated_frames=False):
     """Opens the video file and yields one frame at a time for decoding"""
 
     active_video = cv2.VideoCapture(video_input_path)
     total_video_frames = int(active_video.get(cv2.CAP_PROP_FRAME_COUNT))
-    current_frame_position = 1
 
     yield total_video_frames
 
-    for frame in range(total_video_frames):
-        yield {'frame': active_video.read()[1], 'current_frame_position': current_frame_position}
-        current_frame_position += 1
+    frame_states = ({'frame': active_video.read()[1], 'current_frame_position': current_frame_position}
+                    for current_frame_position in range(1, total_video_frames + 1))
+    if skip_repeated_frames:
+        frame_states = _skip_repeated_frames(frame_states)
+    yield from frame_states
+
+
+def video_frame_range_generator(video_input_path, first_frame_position, last_frame_position,
+                                skip_repeated_frames=False):
+    """Opens its own capture of the video, seeks to first_frame_position, and yields each frame through
+    last_frame_position (both counting from 1, inclusive).  This lets separate processes each decode their own part of
+    the video.
+    """
+
+    active_video = cv2.VideoCapture(video_input_path)
+    active_video.set(cv2.CAP_PROP_POS_FRAMES, first_frame_position - 1)
+
+    frame_states = _read_frame_range(active_video, first_frame_position, last_frame_position)
+    if skip_repeated_frames:
+        frame_states = _skip_repeated_frames(frame_states)
+    yield from frame_states
+    active_video.release()
+
+
+def _read_frame_range(active_video, first_frame_position, last_frame_position):
+    for current_frame_position in range(first_frame_position, last_frame_position + 1):
+        frame_read, frame = active_video.read()
+        if not frame_read:
+            break
+        yield {'frame': frame, 'current_frame_position': current_frame_position}
+
+
+def return_video_partitions(first_frame_position, last_frame_position, partition_count):
+    """Splits the frames from first_frame_position through last_frame_position into up to partition_count contiguous
+    ranges of near equal size, returned as (first, last) tuples.
+    """
+
+    total_frames = last_frame_position - first_frame_position + 1
+    if total_frames < 1:
+        return []
+    partition_count = min(partition_count, total_frames)
+    partition_size, remainder = divmod(total_frames, partition_count)
+
+    partitions = []
+    partition_start = first_frame_position
+    for partition_number in range(partition_count):
+        partition_end = partition_start + partition_size - 1 + int(partition_number < remainder)
+        partitions.append((partition_start, partition_end))
+        partition_start = partition_end + 1
+    return partitions
+
+
+def return_video_codec(video_input_path):
+    """Returns the fourcc of the video's codec as a string, such as 'FMP4' or 'h264'."""
+
+    active_video = cv2.VideoCapture(video_input_path)
+    fourcc = int(active_video.get(cv2.CAP_PROP_FOURCC))
+    active_video.release()
+    return fourcc.to_bytes(4, 'little').decode('latin-1').strip('\x00 ')
@@ -8,6 +8,8 @@ from bitglitter.config.readmodels.streamread import StreamRead
 from bitglitter.config.readmodels.readmodels import StreamFrame, StreamSHA256Blacklist
 from bitglitter.read.decode.headerdecode import custom_palette_header_validate_decode, frame_header_decode, \
     initializer_header_validate_decode, metadata_header_validate_decode, stream_header_decode
+from bitglitter.read.process_state.completedframes import return_worker_completed_frames
+from bitglitter.read.process_state.sharedframering import return_shared_frame
 from bitglitter.read.scan.scanvalidate import frame_lock_on, geometry_override_checkpoint
 from bitglitter.read.scan.scanhandler import ScanHandler
 from bitglitter.utilities.cryptography import get_sha256_hash_from_bytes
@@ -28,7 +30,12 @@ class VideoFrameProcessor:
         self.frame_errors = {}
         self.skip_process = False  # Stream has all frames, pending unpackaging
 
-        self.frame = self.dict_obj['frame']
+        # Frames passed through the shared frame ring only arrive as their slot
+        self.frame_slot = self.dict_obj.get('frame_slot')
+        if self.frame_slot is not None:
+            self.frame = return_shared_frame(self.frame_slot)
+        else:
+            self.frame = self.dict_obj['frame']
         self.frame_pixel_height = self.frame.shape[0]
         self.frame_pixel_width = self.frame.shape[1]
         self.initializer_palette_a = self.dict_obj['initializer_palette_a']
@@ -59,6 +66,7 @@ class VideoFrameProcessor:
         self.metadata_header_bytes = None
         self.palette_header_bytes = None
         self.bits_to_read = None
+        self.frame_results = None  # Frames decoded in worker processes are returned to be saved by the parent
 
         # First frame variables
         self.output_directory = None
@@ -126,6 +134,9 @@ class VideoFrameProcessor:
 
         self._run_statistics()
         self.scan_handler = None  # Keep as is, multiprocessing cannot return its internal generator and crashes
+        # The frame isn't needed past this point, and shouldn't be sent back to the parent with the results
+        self.frame = None
+        self.dict_obj = None
         logging.debug('Frame decode cycle complete.')
 
     def _initial_frame_setup(self):
@@ -243,7 +254,9 @@ class VideoFrameProcessor:
         if self.frame_errors:
             return
 
-        if first_frame or self.stream_read.custom_palette_used and not self.stream_read.custom_palette_loaded:
+        # Frames still carrying setup headers have their frame header in the initializer palette too
+        if first_frame or not self.stream_read.is_payload_ready() or self.stream_read.custom_palette_used and not \
+                self.stream_read.custom_palette_loaded:
             is_initializer_palette = True
         else:
             is_initializer_palette = False
@@ -259,6 +272,18 @@ class VideoFrameProcessor:
         self.bits_to_read = frame_header_decode_results['bits_to_read']
         self.scan_handler.set_bits_to_read(self.bits_to_read)
 
+        # Workers check the completed frames they were started with, rather than the database
+        completed_frames = return_worker_completed_frames()
+        if not self.is_sequential and completed_frames is not None:
+            if self.frame_number in completed_frames:
+                logging.info(f'Frame {self.frame_number} is already complete')
+                self.frame_blocks_left = False
+                self.frame_errors = self.ERROR_BREAK
+            else:
+                logging.debug(f'New frame: #{self.frame_number}')
+                self.is_unique_frame = True
+            return
+
         # Checking if frame exists
         self.stream_frame = StreamFrame.query.filter(StreamFrame.stream_id == self.stream_read.id) \
             .filter(StreamFrame.frame_number == self.frame_number).first()
@@ -270,7 +295,8 @@ class VideoFrameProcessor:
             self.frame_blocks_left = False
             self.frame_errors = self.ERROR_BREAK
         else:  # New frame
-            self.stream_frame = StreamFrame.create(stream_id=self.stream_read.id, frame_number=self.frame_number)
+            if self.is_sequential:
+                self.stream_frame = StreamFrame.create(stream_id=self.stream_read.id, frame_number=self.frame_number)
             logging.debug(f'New frame: #{self.frame_number}')
             self.is_unique_frame = True
 
@@ -481,9 +507,27 @@ class VideoFrameProcessor:
                 self.frame_errors = self.ERROR_FATAL
                 return
 
+            # Workers don't save frames themselves, the parent does so in batches with FrameResultWriter
+            # The payload itself is written straight into the stream's payload store from here.
+            if not self.is_sequential:
+                has_payload = self.payload_in_frame and self.stream_payload_bits.len
+                payload_bytes = self.stream_payload_bits.tobytes() if has_payload else None
+                payload_store = self.stream_read.return_payload_store()
+                if has_payload and payload_store and payload_store.can_store(self.stream_payload_bits.len):
+                    payload_store.write_frame(self.frame_number, payload_bytes)
+                    payload_bytes = None
+                self.frame_results = {'stream_id': self.stream_read.id, 'frame_number': self.frame_number,
+                                      'payload_bits': self.stream_payload_bits.len if has_payload else None,
+                                      'payload': payload_bytes, 'statistics': None}
+                completed_frames = return_worker_completed_frames()
+                if completed_frames is not None:  # Later copies of this frame are dropped by this worker
+                    completed_frames.add(self.frame_number)
+                return
+
             # Marking frame as complete, moving on to next frame
             if self.payload_in_frame:
-                self.stream_frame.finalize_frame(self.stream_payload_bits)
+                self.stream_frame.finalize_frame(self.stream_payload_bits,
+                                                self.stream_read.return_payload_store())
                 if self.is_sequential:  # First frame with payload in it
                     self.stream_read.set_payload_start_data(self.frame_number, self.stream_payload_bits.len)
             else:
@@ -503,7 +547,11 @@ class VideoFrameProcessor:
 
     def _run_statistics(self):
         if self.save_statistics and self.is_unique_frame:
-            read_stats_update(self.scan_handler.block_position, 1, self.scan_handler.payload_bits_read)
+            if self.frame_results:
+                self.frame_results['statistics'] = (self.scan_handler.block_position,
+                                                    self.scan_handler.payload_bits_read)
+            elif self.is_sequential:
+                read_stats_update(self.scan_handler.block_position, 1, self.scan_handler.payload_bits_read)
 
     def _second_frame_onwards_setup(self):
         self.scan_handler = ScanHandler(self.frame, False, self.initializer_palette_a, self.initializer_palette_a_dict,
@@ -0,0 +1,37 @@
+from bitglitter.read.process_state.completedframes import completed_frames_worker_initializer
+from bitglitter.read.process_state.multiprocess_state_generator import video_state_generator
+from bitglitter.read.process_state.videoframegenerator import video_frame_range_generator
+from bitglitter.read.process_state.videoframeprocessor import VideoFrameProcessor
+
+
+def video_partition_processor(dict_obj):
+    """Used with partitioned video reads.  Each worker decodes and processes its own range of the video's frames,
+    rather than having every frame decoded in the parent and passed over.  A single argument must be passed here
+    because multiprocessing's imap requires it.
+    """
+
+    completed_frames_worker_initializer(dict_obj['completed_frames'])
+    frame_generator = video_frame_range_generator(dict_obj['input_path'], dict_obj['first_frame_position'],
+                                                  dict_obj['last_frame_position'], dict_obj['skip_repeated_frames'])
+    frame_states = video_state_generator(frame_generator, dict_obj['stream_read'], dict_obj['save_statistics'],
+                                         dict_obj['initializer_palette_a'], dict_obj['initializer_palette_a_dict'],
+                                         dict_obj['initializer_palette_a_color_set'], dict_obj['total_frames'],
+                                         dict_obj['stream_palette'], dict_obj['stream_palette_dict'],
+                                         dict_obj['stream_palette_color_set'])
+
+    # Frames of the range are returned to be saved by the parent, rather than saved here
+    frame_results = []
+    frames_read = 0
+    frames_failed = 0
+    for frame_state in frame_states:
+        video_frame_processor = VideoFrameProcessor(frame_state)
+        if video_frame_processor.frame_results:
+            frame_results.append(video_frame_processor.frame_results)
+        frames_read += 1
+        if 'error' in video_frame_processor.frame_errors:
+            frames_failed += 1
+            # No point continuing this range if it alone has hit the strike limit
+            if dict_obj['bad_frame_strikes'] and frames_failed >= dict_obj['bad_frame_strikes']:
+                break
+
+    return {'frame_results': frame_results, 'frames_read': frames_read, 'frames_failed': frames_failed}
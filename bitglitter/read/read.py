@@ -17,6 +17,8 @@ def read(file_path,
          output_directory=None,
          bad_frame_strikes=25,
          max_cpu_cores=0,
+         partitioned_video_read=False,
+         skip_repeated_frames=True,
 
          # Overrides
          block_height_override=False,
@@ -67,14 +69,14 @@ def read(file_path,
     input_type = validate_read_parameters(file_path, output_directory, decryption_key, scrypt_n, scrypt_r, scrypt_p,
                                           block_height_override, block_width_override, max_cpu_cores, save_statistics,
                                           bad_frame_strikes, stop_at_metadata_load, auto_unpackage_stream,
-                                          auto_delete_finished_stream)
+                                          auto_delete_finished_stream, partitioned_video_read, skip_repeated_frames)
 
     # Pull valid frame data from the inputted file.
     frame_read_results = frame_read_handler(file_path, output_directory, input_type, bad_frame_strikes, max_cpu_cores,
                                             block_height_override, block_width_override, decryption_key, scrypt_n,
                                             scrypt_r, scrypt_p, working_directory, stop_at_metadata_load,
                                             auto_unpackage_stream, auto_delete_finished_stream, save_statistics,
-                                            valid_image_formats)
+                                            valid_image_formats, partitioned_video_read, skip_repeated_frames)
 
     # Removing temporary directory
     remove_working_folder(working_directory)
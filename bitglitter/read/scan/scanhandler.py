@@ -1,8 +1,9 @@
-from bitstring import BitStream
+import numpy
 
 import math
 
-from bitglitter.read.scan.scanutilities import color_snap, scan_block
+from bitglitter.read.scan.scanutilities import classify_colors, scan_frame
+from bitglitter.utilities.bitpacking import bits_to_bitstream, rgb_to_bits, symbols_to_bits
 
 
 class ScanHandler:
@@ -34,16 +35,16 @@ class ScanHandler:
         self.y_range = 0
         self.x_position = 0
         self.y_position = 0
-        self.next_block_to_scan = None
+        self.block_colors = None
         self.block_position = 0
         self.remaining_blocks = 0
         self.bits_to_read = 0
         self.payload_bits_read = 0
         self.bits_read = 0
-        self.leftover_bits = BitStream()
+        self.leftover_bits = numpy.empty(0, dtype=numpy.uint8)
 
         # Class state before last action
-        self.prior_leftover_bits = BitStream()
+        self.prior_leftover_bits = self.leftover_bits
         self.prior_x_position = 0
         self.prior_y_position = 0
         self.prior_number_of_bits = 0 #?
@@ -52,31 +53,34 @@ class ScanHandler:
         #  Additional setup if we have more starting data
         if self.block_height and self.block_width and self.pixel_width:
             self._geometry_setup()
-            self.next_block_to_scan = self._frame_coordinate_generator()
 
     def _geometry_setup(self):
         self.x_range = self.block_width - int(self.has_initializer)
         self.y_range = self.block_height - int(self.has_initializer)
         self.remaining_blocks = self.x_range * self.y_range
+        self.block_colors = None
 
     def _undo_last_task(self):
-        """Moves coordinates in generator back before the last task was executed."""
+        """Moves scan position back before the last task was executed."""
         self.leftover_bits = self.prior_leftover_bits
         self.x_position = self.prior_x_position
         self.y_position = self.prior_y_position
         self.remaining_blocks = self.prior_remaining_blocks
 
-    def _frame_coordinate_generator(self):
-        """Creates a generator that outputs the correct block coordinates for scan_block to utilize.  This depends on
-         whether an initializer is used in this frame or not.
+    def _return_block_colors(self, number_of_blocks):
+        """Returns the average RGB values of the next blocks to scan, in scan order.  The entire frame is sampled in one
+        pass the first time blocks are requested, and the results are then sliced as the frame is read.  Block position
+        is tracked through x_position/y_position so _undo_last_task() rewinds it.
         """
 
-        while self.y_position < self.y_range:
-            yield self.x_position + int(self.has_initializer), self.y_position + int(self.has_initializer)
-            self.x_position += 1
-            if self.x_position == self.x_range:
-                self.x_position = 0
-                self.y_position += 1
+        if self.block_colors is None:
+            self.block_colors = scan_frame(self.frame, self.pixel_width, self.block_height, self.block_width)[
+                                int(self.has_initializer):, int(self.has_initializer):].reshape(-1, 3)
+
+        start_block = self.y_position * self.x_range + self.x_position
+        end_block = start_block + number_of_blocks
+        self.y_position, self.x_position = divmod(end_block, self.x_range)
+        return self.block_colors[start_block:end_block]
 
     def return_bits(self, number_of_bits, is_initializer_palette, is_payload, byte_input=False, redo=False):
 
@@ -96,56 +100,48 @@ class ScanHandler:
             self.payload_bits_read += number_of_bits
 
         if is_initializer_palette:
+            active_palette = self.initializer_palette
             active_color_set = self.initializer_color_set
-            active_color_dict = self.initializer_palette_dict
             active_bit_length = self.initializer_palette.bit_length
         else:
+            active_palette = self.stream_palette
             active_color_set = self.stream_palette_color_set
-            active_color_dict = self.stream_palette_dict
             active_bit_length = self.stream_palette.bit_length
 
         complete_request = True
         if number_of_bits:  # Set amount of bits to scan
-            number_of_blocks = int(math.ceil((number_of_bits - self.leftover_bits.len) / active_bit_length))
+            number_of_blocks = int(math.ceil((number_of_bits - self.leftover_bits.size) / active_bit_length))
             if number_of_blocks > self.remaining_blocks:
                 number_of_blocks = self.remaining_blocks
                 complete_request = False
         else:  # If 0, scans the rest of the frame
             number_of_blocks = self.remaining_blocks
 
-        bits = self.leftover_bits if self.leftover_bits.len > 0 else BitStream()
-
-        for block in range(number_of_blocks):
-            block_coordinates = next(self.next_block_to_scan)
-            average_rgb = scan_block(self.frame, self.pixel_width, block_coordinates[0], block_coordinates[1])
-
-            if active_color_set:  # Non-24 bit palette
-                bits.append(active_color_dict.get_value(color_snap(average_rgb, active_color_set)))
-            else:  # 24 bit palette
-                bits.append(active_color_dict.get_value(average_rgb))
+        block_colors = self._return_block_colors(number_of_blocks)
+        if active_color_set:  # Non-24 bit palette
+            color_indexes = classify_colors(block_colors, active_palette.palette_id, active_color_set)
+            scanned_bits = symbols_to_bits(color_indexes, active_bit_length)
+        else:  # 24 bit palette
+            scanned_bits = rgb_to_bits(block_colors)
         self.remaining_blocks -= number_of_blocks
 
-        bits = BitStream(bits)
-        if bits.len > number_of_bits:
-            bits.pos = number_of_bits
-            self.leftover_bits = bits.read(bits.len - number_of_bits)
-            bits.pos = 0
-            bits = bits.read(number_of_bits)
+        bits = numpy.concatenate((self.leftover_bits, scanned_bits))
+        self.leftover_bits = bits[number_of_bits:] if bits.size > number_of_bits else bits[:0]
+        bits = bits[:number_of_bits] if bits.size > number_of_bits else bits
         if complete_request:
-            assert bits.len == number_of_bits
+            assert bits.size == number_of_bits
 
         # Statistics update
         self.block_position += number_of_blocks
         self.bits_read += number_of_bits
 
-        return {'bits': bits, 'complete_request': complete_request}
+        return {'bits': bits_to_bitstream(bits), 'complete_request': complete_request}
 
     def set_scan_geometry(self, block_height, block_width, pixel_width):
         self.block_height = block_height
         self.block_width = block_width
         self.pixel_width = pixel_width
         self._geometry_setup()
-        self.next_block_to_scan = self._frame_coordinate_generator()
 
     def set_stream_palette(self, stream_palette, stream_palette_dict, stream_palette_color_set):
         self.stream_palette = stream_palette
@@ -23,22 +23,65 @@ def color_snap(raw_frame_rgb, palette_color_list):
     return closest_palette_match
 
 
-def scan_block(image, pixel_width, block_width_position, block_height_position):
-    """This function is whats used to scan the blocks used.  First the scan area is determined, and then each of the
-    pixels in that area appended to a list.  An average of those values as type int is returned.
+# Palette colors prepared for classify_colors(), keyed by palette ID.  Each process builds these once and reuses them
+# for every frame it reads.
+_palette_classifier_cache = {}
+
+# Maximum blocks classified at once, keeping the (blocks, palette colors) distance matrix to a modest size.
+_CLASSIFY_CHUNK_SIZE = 65536
+
+
+def return_palette_classifier(palette_id, palette_color_list):
+    """Returns the palette's colors as an int32 array along with their squared magnitudes, cached per palette ID."""
+
+    if palette_id not in _palette_classifier_cache:
+        palette_colors = numpy.array(palette_color_list, dtype=numpy.int32)
+        _palette_classifier_cache[palette_id] = (palette_colors, (palette_colors ** 2).sum(axis=1))
+    return _palette_classifier_cache[palette_id]
+
+
+def classify_colors(raw_colors_rgb, palette_id, palette_color_list):
+    """The vectorized equivalent of color_snap(), classifying an (n, 3) array of RGB values at once.  The index of the
+    closest palette color is returned for each of them.  Since |a - c|^2 = |a|^2 - 2a.c + |c|^2 and |a|^2 is the same
+    for every palette color, only the last two terms are needed to rank them.  Ties go to the first color, as with
+    color_snap().
+    """
+
+    palette_colors, palette_magnitudes = return_palette_classifier(palette_id, palette_color_list)
+    raw_colors_rgb = numpy.asarray(raw_colors_rgb, dtype=numpy.int32).reshape(-1, 3)
+    color_indexes = numpy.empty(len(raw_colors_rgb), dtype=numpy.intp)
+
+    for chunk_start in range(0, len(raw_colors_rgb), _CLASSIFY_CHUNK_SIZE):
+        chunk = raw_colors_rgb[chunk_start:chunk_start + _CLASSIFY_CHUNK_SIZE]
+        distances = palette_magnitudes - 2 * (chunk @ palette_colors.T)
+        color_indexes[chunk_start:chunk_start + len(chunk)] = distances.argmin(axis=1)
+
+    return color_indexes
+
+
+def _block_scan_area(pixel_width, block_position):
+    """Returns the start and end pixel (end exclusive) of the area sampled for a block along a single axis.  Larger
+    blocks only have their center scanned, to keep color bleed from neighboring blocks out of the average.
     """
 
     if pixel_width < 5:
-        start_position_x = int(block_width_position * pixel_width)
-        end_position_x = int((block_width_position * pixel_width) + pixel_width - 1)
-        start_position_y = int(block_height_position * pixel_width)
-        end_position_y = int((block_height_position * pixel_width) + pixel_width - 1)
+        start_position = int(block_position * pixel_width)
+        end_position = int((block_position * pixel_width) + pixel_width - 1)
 
     else:
-        start_position_x = int(round((block_width_position * pixel_width) + (pixel_width * .25), 1))
-        end_position_x = int(round(start_position_x + (pixel_width * .5), 1))
-        start_position_y = int(round((block_height_position * pixel_width) + (pixel_width * .25), 1))
-        end_position_y = int(round(start_position_y + (pixel_width * .5), 1))
+        start_position = int(round((block_position * pixel_width) + (pixel_width * .25), 1))
+        end_position = int(round(start_position + (pixel_width * .5), 1))
+
+    return start_position, end_position
+
+
+def scan_block(image, pixel_width, block_width_position, block_height_position):
+    """This function is whats used to scan the blocks used.  First the scan area is determined, and then each of the
+    pixels in that area appended to a list.  An average of those values as type int is returned.
+    """
+
+    start_position_x, end_position_x = _block_scan_area(pixel_width, block_width_position)
+    start_position_y, end_position_y = _block_scan_area(pixel_width, block_height_position)
 
     numpy_output = numpy.flip(image[start_position_y:end_position_y, start_position_x:end_position_x]).mean(axis=(0, 1))
     to_list_format = numpy_output.tolist()
@@ -47,3 +90,44 @@ def scan_block(image, pixel_width, block_width_position, block_height_position):
         to_list_format[value] = int(to_list_format[value])
 
     return to_list_format
+
+
+def scan_frame(image, pixel_width, block_height, block_width):
+    """Scans every block of the frame at once, returning a (block_height, block_width, 3) array of their average RGB
+    values.  Each block is sampled over the same area scan_block() uses, and averages are truncated the same way, so
+    the results are identical to scanning them one at a time.
+    """
+
+    image_height, image_width = image.shape[:2]
+    x_areas = numpy.array([_block_scan_area(pixel_width, x) for x in range(block_width)], dtype=numpy.int64)
+    y_areas = numpy.array([_block_scan_area(pixel_width, y) for y in range(block_height)], dtype=numpy.int64)
+    x_areas = numpy.clip(x_areas, 0, image_width)
+    y_areas = numpy.clip(y_areas, 0, image_height)
+    x_lengths = numpy.maximum(x_areas[:, 1] - x_areas[:, 0], 0)
+    y_lengths = numpy.maximum(y_areas[:, 1] - y_areas[:, 0], 0)
+
+    x_offsets = x_areas[:, 0] - numpy.arange(block_width) * pixel_width
+    y_offsets = y_areas[:, 0] - numpy.arange(block_height) * pixel_width
+    uniform_blocks = float(pixel_width).is_integer() and block_height * pixel_width <= image_height \
+        and block_width * pixel_width <= image_width and numpy.all(x_offsets == x_offsets[0]) \
+        and numpy.all(y_offsets == y_offsets[0]) and numpy.all(x_lengths == x_lengths[0]) \
+        and numpy.all(y_lengths == y_lengths[0])
+
+    if uniform_blocks:  # Every block is the same size, so the frame can be viewed as a grid of blocks
+        pixel_width = int(pixel_width)
+        x_offset, y_offset = int(x_offsets[0]), int(y_offsets[0])
+        block_view = image[:block_height * pixel_width, :block_width * pixel_width] \
+            .reshape(block_height, pixel_width, block_width, pixel_width, 3)
+        block_sums = block_view[:, y_offset:y_offset + y_lengths[0], :, x_offset:x_offset + x_lengths[0]] \
+            .sum(axis=(1, 3), dtype=numpy.int64)
+
+    else:  # Fractional pixel widths; sums are taken from an integral image instead
+        integral_image = numpy.zeros((image_height + 1, image_width + 1, 3), dtype=numpy.int64)
+        integral_image[1:, 1:] = image.cumsum(axis=0, dtype=numpy.int64).cumsum(axis=1)
+        y_start, x_start = numpy.ix_(y_areas[:, 0], x_areas[:, 0])
+        y_end, x_end = numpy.ix_(y_areas[:, 0] + y_lengths, x_areas[:, 0] + x_lengths)
+        block_sums = integral_image[y_end, x_end] - integral_image[y_start, x_end] - integral_image[y_end, x_start] \
+            + integral_image[y_start, x_start]
+
+    block_areas = numpy.maximum(numpy.outer(y_lengths, x_lengths), 1)[:, :, numpy.newaxis]
+    return (block_sums // block_areas)[:, :, ::-1]
@@ -87,24 +87,76 @@ def frame_lock_on(frame, block_height_override, block_width_override, frame_pixe
     return {'block_height': block_height, 'block_width': block_width, 'pixel_width': pixel_width}
 
 
-def verify_blocks_x(image, pixel_width, block_width_estimate, combined_colors, initializer_palette_a_dict,
-                    initializer_palette_b_dict, override=False):
-    """This is a function used within frame_lock_on().  It verifies the correct values for the X axis."""
+# Lock on results by frame shape.  Images of a stream are rendered at the same size, so after the first one is locked
+# onto, the rest only need their calibrators read once at the saved geometry rather than crept over pixel by pixel.
+# Each worker process keeps its own.
+_lock_on_cache = {}
 
-    calibrator_bits_x = BitArray()
-    for x_block in range(17):
-        snapped_value = color_snap(scan_block(image, pixel_width, x_block, 0), combined_colors)
 
-        if x_block % 2 == 0:
-            calibrator_bits_x.append(initializer_palette_a_dict.get_value(snapped_value))
+def cached_frame_lock_on(frame, block_height_override, block_width_override, frame_pixel_height, frame_pixel_width,
+                         initializer_palette_a_color_set, initializer_palette_b_color_set, initializer_palette_a_dict,
+                         initializer_palette_b_dict):
+    """Same as frame_lock_on(), but reuses the geometry of an earlier frame of the same shape if both of this frame's
+    calibrators read the same values with it.  Falls back to a full lock on otherwise.
+    """
+
+    if block_height_override and block_width_override:  # Overrides are only verified, there is nothing to creep over
+        return frame_lock_on(frame, block_height_override, block_width_override, frame_pixel_height,
+                             frame_pixel_width, initializer_palette_a_color_set, initializer_palette_b_color_set,
+                             initializer_palette_a_dict, initializer_palette_b_dict)
+
+    cached_lock_on = _lock_on_cache.get(frame.shape)
+    if cached_lock_on and return_distance(frame[0, 0], (0, 0, 0)) <= 100:
+        combined_colors = initializer_palette_a_color_set + initializer_palette_b_color_set
+        calibrator_x = read_calibrator(frame, frame_pixel_width / cached_lock_on['block_width'], combined_colors,
+                                       initializer_palette_a_dict, initializer_palette_b_dict, width_axis=True)
+        calibrator_y = read_calibrator(frame, cached_lock_on['pixel_width'], combined_colors,
+                                       initializer_palette_a_dict, initializer_palette_b_dict, width_axis=False)
+        if calibrator_x == (cached_lock_on['block_width'], False) and \
+                calibrator_y == (cached_lock_on['block_height'], False):
+            logging.debug('Calibrators match the lock on of an earlier frame, reusing it.')
+            return dict(cached_lock_on)
+        logging.debug('Calibrators differ from the lock on of an earlier frame of this size, locking on again...')
+
+    lock_on_results = frame_lock_on(frame, block_height_override, block_width_override, frame_pixel_height,
+                                    frame_pixel_width, initializer_palette_a_color_set,
+                                    initializer_palette_b_color_set, initializer_palette_a_dict,
+                                    initializer_palette_b_dict)
+    if lock_on_results:
+        _lock_on_cache[frame.shape] = dict(lock_on_results)
+    return lock_on_results
+
+
+def read_calibrator(image, pixel_width, combined_colors, initializer_palette_a_dict, initializer_palette_b_dict,
+                    width_axis):
+    """Reads the calibrator along the top (width_axis) or the left of the frame using a known pixel_width, returning
+    the block dimension it encodes along with the bit after it, which is False for a valid 0,0 block.
+    """
+
+    calibrator_bits = BitArray()
+    for block in range(17):
+        block_position = (block, 0) if width_axis else (0, block)
+        snapped_value = color_snap(scan_block(image, pixel_width, *block_position), combined_colors)
+
+        if block % 2 == 0:
+            calibrator_bits.append(initializer_palette_a_dict.get_value(snapped_value))
 
         else:
-            calibrator_bits_x.append(initializer_palette_b_dict.get_value(snapped_value))
+            calibrator_bits.append(initializer_palette_b_dict.get_value(snapped_value))
 
-    calibrator_bits_x.reverse()
-    read_calibrator_x = ConstBitStream(calibrator_bits_x)
+    calibrator_bits.reverse()
+    read_calibrator_bits = ConstBitStream(calibrator_bits)
+    return read_calibrator_bits.read('uint:16'), read_calibrator_bits.read('bool')
 
-    if read_calibrator_x.read('uint:16') != block_width_estimate:
+
+def verify_blocks_x(image, pixel_width, block_width_estimate, combined_colors, initializer_palette_a_dict,
+                    initializer_palette_b_dict, override=False):
+    """This is a function used within frame_lock_on().  It verifies the correct values for the X axis."""
+
+    block_width, corner_bit = read_calibrator(image, pixel_width, combined_colors, initializer_palette_a_dict,
+                                              initializer_palette_b_dict, width_axis=True)
+
+    if block_width != block_width_estimate:
         if override:
             logging.warning('block_width_override is not equal to what was read on calibrator.  Aborting...')
 
@@ -114,7 +166,7 @@ def verify_blocks_x(image, pixel_width, block_width_estimate, combined_colors, i
 
         return False
 
-    if read_calibrator_x.read('bool'):
+    if corner_bit:
         logging.warning('0,0 block unexpected value.  Aborting...')
         return False
 
@@ -131,20 +183,10 @@ def verify_blocks_y(image, pixel_width, block_height_estimate, combined_colors,
                     initializer_palette_b_dict, override=False):
     """This is a function used within frame_lock_on().  It verifies the correct values for the Y axis."""
 
-    calibrator_bits_y = BitArray()
-    for y_block in range(17):
-        snapped_value = color_snap(scan_block(image, pixel_width, 0, y_block), combined_colors)
-
-        if y_block % 2 == 0:
-            calibrator_bits_y.append(initializer_palette_a_dict.get_value(snapped_value))
-
-        else:
-            calibrator_bits_y.append(initializer_palette_b_dict.get_value(snapped_value))
-
-    calibrator_bits_y.reverse()
-    read_calibrator_y = ConstBitStream(calibrator_bits_y)
+    block_height, corner_bit = read_calibrator(image, pixel_width, combined_colors, initializer_palette_a_dict,
+                                               initializer_palette_b_dict, width_axis=False)
 
-    if read_calibrator_y.read('uint:16') != block_height_estimate:
+    if block_height != block_height_estimate:
         if override:
             logging.warning('block_height_override is not equal to what was read on calibrator.  Aborting...')
 
@@ -154,7 +196,7 @@ def verify_blocks_y(image, pixel_width, block_height_estimate, combined_colors,
 
         return False
 
-    if read_calibrator_y.read('bool'):
+    if corner_bit:
         logging.warning('0,0 block unexpected value.  Aborting...')
         return False
 
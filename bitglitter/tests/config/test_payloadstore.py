@@ -0,0 +1,57 @@
+from bitstring import BitStream
+
+import os
+import tempfile
+import unittest
+
+from bitglitter.config.readmodels.payloadstore import PayloadStore
+from bitglitter.config.readmodels.readmodels import StreamFrame
+from bitglitter.config.readmodels.streamread import StreamRead
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.stream_sha256 = os.urandom(32).hex()
+        self.payload_store = PayloadStore(self.directory.name, self.stream_sha256, 64)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Frames written in any order must land in their own slots.
+    def test_outOfOrderWrites(self):
+        frames = {frame_number: os.urandom(8) for frame_number in range(1, 6)}
+        for frame_number in (4, 1, 5, 3, 2):
+            self.payload_store.write_frame(frame_number, frames[frame_number])
+        self.assertEqual(self.payload_store.read_frames(1, 5), b''.join(frames[number] for number in range(1, 6)))
+        self.assertEqual(self.payload_store.read_frames(3, 3), frames[3])
+
+    # Slots of frames not read yet, including past the end of the file, read back as zeros.
+    def test_readAcrossHoles(self):
+        self.assertEqual(self.payload_store.read_frames(1, 2), bytes(16))
+        self.payload_store.write_frame(2, b'\xff' * 8)
+        self.payload_store.write_frame(5, b'\xee' * 8)
+        self.assertEqual(self.payload_store.read_frames(1, 7), bytes(8) + b'\xff' * 8 + bytes(16) + b'\xee' * 8 +
+                         bytes(16))
+
+    # Payloads too large for a slot are kept in the frame's BLOB column instead.
+    def test_oversizedPayloadInDatabase(self):
+        self.assertTrue(self.payload_store.can_store(64))
+        self.assertFalse(self.payload_store.can_store(65))
+        stream_read = StreamRead.create(stream_sha256=self.stream_sha256, stream_is_video=False,
+                                        payload_store_directory=self.directory.name)
+        try:
+            payload_bytes = os.urandom(9)
+            stream_frame = StreamFrame.create(stream_id=stream_read.id, frame_number=1)
+            stream_frame.finalize_frame(BitStream(payload_bytes), self.payload_store)
+            self.assertEqual(stream_frame.payload, payload_bytes)
+            self.assertEqual(stream_frame.payload_bits, 72)
+            self.assertFalse(self.payload_store.store_path.exists())
+            self.assertEqual(stream_frame.return_payload_bytes(self.payload_store.read_frames(1, 1)), payload_bytes)
+        finally:
+            stream_read.delete()
+
+
+if __name__ == '__main__':
+    unittest.main()
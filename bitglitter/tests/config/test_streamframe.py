@@ -0,0 +1,40 @@
+from bitstring import BitStream
+
+import os
+import tempfile
+import unittest
+
+from bitglitter.config.readmodels.payloadstore import PayloadStore
+from bitglitter.config.readmodels.readmodels import StreamFrame
+from bitglitter.config.readmodels.streamread import StreamRead
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.stream_read = StreamRead.create(stream_sha256=os.urandom(32).hex(), stream_is_video=False,
+                                             payload_store_directory=self.directory.name)
+
+    def tearDown(self):
+        self.stream_read.delete()
+        self.directory.cleanup()
+
+    # A BitStream with no bits set is falsy, yet it's still a payload that has to be kept.
+    def test_allZeroPayloadKept(self):
+        payload_store = PayloadStore(self.directory.name, self.stream_read.stream_sha256, 64)
+        stream_frame = StreamFrame.create(stream_id=self.stream_read.id, frame_number=1)
+        stream_frame.finalize_frame(BitStream(bytes(8)), payload_store)
+        self.assertEqual(stream_frame.payload_bits, 64)
+        self.assertFalse(stream_frame.added_to_progress)
+        self.assertEqual(payload_store.read_frames(1, 1), bytes(8))
+
+    def test_emptyPayload(self):
+        stream_frame = StreamFrame.create(stream_id=self.stream_read.id, frame_number=1)
+        stream_frame.finalize_frame(BitStream())
+        self.assertIsNone(stream_frame.payload_bits)
+        self.assertTrue(stream_frame.added_to_progress)
+
+
+if __name__ == '__main__':
+    unittest.main()
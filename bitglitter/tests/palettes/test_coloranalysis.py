@@ -1,5 +1,5 @@
 import unittest
-from bitglitter.read.framescan.scanutilities import color_snap
+from bitglitter.read.scan.scanutilities import classify_colors, color_snap
 
 
 class Test(unittest.TestCase):
@@ -10,6 +10,14 @@ class Test(unittest.TestCase):
         self.assertEqual(color_snap((100, 100, 100), ((0, 0, 0), (255, 255, 255))), (0, 0, 0))
         self.assertEqual(color_snap((235, 210, 255), ((0, 0, 0), (255, 255, 255))), (255, 255, 255))
 
+    # Every color must snap to the same palette color as color_snap, including ties going to the first color.
+    def test_classifyColors(self):
+        palette = ((0, 0, 0), (255, 0, 0), (0, 255, 0), (0, 0, 255))
+        raw_colors = ((0, 0, 0), (200, 30, 40), (10, 180, 90), (90, 10, 180), (128, 128, 0), (128, 128, 128))
+        color_indexes = classify_colors(raw_colors, 'test_classify_colors', palette)
+        self.assertEqual([palette[index] for index in color_indexes],
+                         [color_snap(raw_color, palette) for raw_color in raw_colors])
+
     def test_returnDistance(self):
         # self.assertAlmostEqual()
         pass # Will finish once framelockon module is complete
@@ -0,0 +1,58 @@
+import cv2
+import numpy
+
+import os
+from pathlib import Path
+import tempfile
+import unittest
+
+from bitglitter.read.process_state.videoframegenerator import _skip_repeated_frames, is_repeated_frame, \
+    return_frame_fingerprint
+from bitglitter.write.write import write
+
+
+class Test(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            (directory / 'payload.bin').write_bytes(os.urandom(8000))
+            (directory / 'frames').mkdir()
+            write(str(directory / 'payload.bin'), stream_name='Test', output_directory=str(directory / 'frames'),
+                  output_mode='image', compression_enabled=False, max_cpu_cores=1, logging_stdout_output=False)
+            frame_paths = sorted((directory / 'frames').glob('*.png'), key=lambda path: int(path.stem.split(' ')[-1]))
+            cls.frames = [cv2.imread(str(frame_path)) for frame_path in frame_paths]
+
+    @staticmethod
+    def _return_kept_positions(frames):
+        frame_states = ({'frame': frame, 'current_frame_position': position} for position, frame in
+                        enumerate(frames, start=1))
+        return [frame_state['current_frame_position'] for frame_state in _skip_repeated_frames(frame_states)]
+
+    # Each rendered frame captured several times in a row is only kept once.
+    def test_repeatedFramesDropped(self):
+        frames = [frame for frame in self.frames for _ in range(3)]
+        self.assertEqual(self._return_kept_positions(frames), list(range(1, len(frames) + 1, 3)))
+
+    def test_distinctFramesKept(self):
+        self.assertGreater(len(self.frames), 2)
+        self.assertEqual(self._return_kept_positions(self.frames), list(range(1, len(self.frames) + 1)))
+
+    # A single changed block is enough for a frame to count as a new one.
+    def test_singleBlockChangeKept(self):
+        changed_frame = self.frames[0].copy()
+        changed_frame[480:504, 960:984] = 255 - changed_frame[480:504, 960:984]
+        self.assertFalse(is_repeated_frame(return_frame_fingerprint(changed_frame),
+                                           return_frame_fingerprint(self.frames[0])))
+
+    # Small amounts of noise from lossy capture don't stop a repeat from being recognized.
+    def test_noisyRepeatDropped(self):
+        noise = numpy.random.default_rng(0).integers(-2, 3, self.frames[0].shape)
+        noisy_frame = numpy.clip(self.frames[0].astype(numpy.int16) + noise, 0, 255).astype(numpy.uint8)
+        self.assertTrue(is_repeated_frame(return_frame_fingerprint(noisy_frame),
+                                          return_frame_fingerprint(self.frames[0])))
+
+
+if __name__ == '__main__':
+    unittest.main()
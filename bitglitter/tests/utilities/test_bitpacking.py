@@ -0,0 +1,27 @@
+from bitstring import BitStream
+
+import io
+import random
+import unittest
+
+from bitglitter.utilities.bitpacking import BitRangeWriter
+
+
+class Test(unittest.TestCase):
+
+    # Writing ranges of bits one after another must match concatenating them as bitstrings, aligned or not.
+    def test_bitRangeWriter(self):
+        random_generator = random.Random(0)
+        for trial in range(200):
+            file_writer = io.BytesIO()
+            bit_range_writer = BitRangeWriter(file_writer)
+            expected = BitStream()
+            for bit_range in range(random_generator.randint(1, 6)):
+                source_bytes = random_generator.randbytes(random_generator.randint(1, 40))
+                bit_start = random_generator.randint(0, len(source_bytes) * 8 - 1)
+                bit_length = random_generator.randint(0, len(source_bytes) * 8 - bit_start)
+                if trial % 3 == 0:
+                    bit_start, bit_length = (bit_start // 8) * 8, (bit_length // 8) * 8
+                bit_range_writer.write_bits(source_bytes, bit_start, bit_length)
+                expected += BitStream(bytes=source_bytes)[bit_start:bit_start + bit_length]
+            self.assertEqual(file_writer.getvalue(), expected[:(expected.len // 8) * 8].tobytes())
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from bitglitter.utilities.compression import compress_file, decompress_file, is_compression_codec_available, \
+    is_compression_worthwhile
+
+
+class Test(unittest.TestCase):
+
+    # Every available codec must return the original file after compressing and decompressing it.
+    def test_codecRoundTrip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            data = b'BitGlitter ' * 50000 + os.urandom(5000)
+            (directory / 'raw.bin').write_bytes(data)
+            for codec in ('zlib', 'zstd', 'lzma', 'none'):
+                if not is_compression_codec_available(codec):
+                    continue
+                compress_file(directory / 'raw.bin', directory / 'compressed.bin', 'write', remove_input=False,
+                              codec=codec)
+                decompress_file(directory / 'compressed.bin', directory / 'decompressed.bin', codec=codec)
+                self.assertEqual((directory / 'decompressed.bin').read_bytes(), data)
+
+    # Random data can't be compressed and should be stored as is, while repetitive data should be compressed.
+    def test_compressionWorthwhile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            (directory / 'random.bin').write_bytes(os.urandom(1000000))
+            (directory / 'text.txt').write_bytes(b'BitGlitter ' * 100000)
+            self.assertFalse(is_compression_worthwhile(directory / 'random.bin'))
+            self.assertTrue(is_compression_worthwhile(directory / 'text.txt'))
+            self.assertTrue(is_compression_worthwhile(directory / 'text.txt', 'lzma'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from bitglitter.utilities.cryptography import AEAD_CHUNK_SIZE, decrypt_file, decrypt_header_bytes, derive_stream_key, \
+    encrypt_bytes, encrypt_header_bytes, StreamEncryptor
+
+
+class Test(unittest.TestCase):
+
+    @staticmethod
+    def _encrypt(data, stream_key_salt=None, piece_size=300000):
+        encryptor = StreamEncryptor('BitGlitter', stream_key_salt=stream_key_salt)
+        return b''.join(encryptor.update(data[position:position + piece_size]) for position in
+                        range(0, len(data), piece_size)) + encryptor.finalize()
+
+    # Data fed in any size of pieces must decrypt back to the original, including sizes on chunk boundaries.
+    def test_roundTrip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            for size in (0, 5000, AEAD_CHUNK_SIZE, AEAD_CHUNK_SIZE * 2 + 7):
+                data = os.urandom(size)
+                (directory / 'encrypted.bin').write_bytes(self._encrypt(data))
+                decrypt_file(directory / 'encrypted.bin', directory / 'decrypted.bin', 'BitGlitter', max_workers=2)
+                self.assertEqual((directory / 'decrypted.bin').read_bytes(), data)
+
+    # Files encrypted with a key derived from the stream key must only decrypt with the same stream key salt.
+    def test_streamKeyRoundTrip(self):
+        stream_key_salt = os.urandom(16)
+        data = os.urandom(50000)
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            (directory / 'encrypted.bin').write_bytes(self._encrypt(data, stream_key_salt))
+            decrypt_file(directory / 'encrypted.bin', directory / 'decrypted.bin', 'BitGlitter', remove_input=False,
+                         stream_key_salt=stream_key_salt)
+            self.assertEqual((directory / 'decrypted.bin').read_bytes(), data)
+            with self.assertRaises(ValueError):
+                decrypt_file(directory / 'encrypted.bin', directory / 'decrypted.bin', 'BitGlitter',
+                             stream_key_salt=os.urandom(16))
+
+    # Dropping whole chunks off the end must fail, rather than decrypting what's left.
+    def test_truncationDetected(self):
+        encrypted = self._encrypt(os.urandom(AEAD_CHUNK_SIZE * 2 + 7))
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            (directory / 'encrypted.bin').write_bytes(encrypted[:-23])
+            with self.assertRaises(ValueError):
+                decrypt_file(directory / 'encrypted.bin', directory / 'decrypted.bin', 'BitGlitter')
+
+    # The header must not be encrypted with the stream key itself, as the file keys are derived from it.
+    def test_headerRoundTrip(self):
+        stream_key_salt = os.urandom(16)
+        header = os.urandom(1000)
+        encrypted = encrypt_header_bytes(header, 'BitGlitter', stream_key_salt)
+        self.assertEqual(decrypt_header_bytes(encrypted, 'BitGlitter'), header)
+        self.assertIsNone(decrypt_header_bytes(encrypted, 'Glitter'))
+        stream_key = derive_stream_key('BitGlitter', stream_key_salt)
+        self.assertNotIn(AESGCM(stream_key).encrypt(encrypted[16:28], header, None), encrypted)
+
+    # Headers written before the header key was derived with HKDF still decrypt.
+    def test_legacyHeaderDecrypt(self):
+        header = os.urandom(1000)
+        self.assertEqual(decrypt_header_bytes(encrypt_bytes(header, 'BitGlitter'), 'BitGlitter'), header)
+
+    def test_streamKeyCached(self):
+        stream_key_salt = os.urandom(16)
+        derive_stream_key('BitGlitter', stream_key_salt)
+        hits = derive_stream_key.cache_info().hits
+        derive_stream_key('BitGlitter', stream_key_salt)
+        self.assertEqual(derive_stream_key.cache_info().hits, hits + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import random
+import unittest
+
+from bitglitter.utilities.intervalset import IntervalSet
+
+
+class Test(unittest.TestCase):
+
+    def test_intervalSetMerging(self):
+        interval_set = IntervalSet([(10, 19), (30, 39)])
+        interval_set.add(20, 29)
+        self.assertEqual(list(interval_set), [(10, 39)])
+        interval_set.add(50, 59)
+        interval_set.add(0, 5)
+        self.assertEqual(list(interval_set), [(0, 5), (10, 39), (50, 59)])
+        self.assertTrue(interval_set.covers(12, 39))
+        self.assertFalse(interval_set.covers(5, 10))
+
+    # Ranges added in any order must cover exactly the integers added.
+    def test_intervalSetRandom(self):
+        random_generator = random.Random(0)
+        for trial in range(200):
+            interval_set = IntervalSet()
+            expected = set()
+            for addition in range(random_generator.randint(1, 15)):
+                start = random_generator.randint(0, 100)
+                end = start + random_generator.randint(0, 10)
+                interval_set.add(start, end)
+                expected.update(range(start, end + 1))
+            covered = set()
+            previous_end = -2
+            for start, end in interval_set:
+                self.assertGreater(start, previous_end + 1)
+                covered.update(range(start, end + 1))
+                previous_end = end
+            self.assertEqual(covered, expected)
@@ -0,0 +1,108 @@
+from bitstring import BitStream
+import numpy
+
+
+def bitstream_to_bits(bitstream):
+    """Frames are handled internally as flat numpy arrays of bits (one uint8 of 0 or 1 per bit), which convert to and
+    from block symbols in bulk.  This returns a bitstring object in that form.
+    """
+
+    return numpy.unpackbits(numpy.frombuffer(bitstream.tobytes(), dtype=numpy.uint8))[:bitstream.len]
+
+
+def bits_to_bitstream(bit_array):
+    """Returns a flat bit array as a BitStream."""
+    return BitStream(bytes=numpy.packbits(bit_array).tobytes(), length=len(bit_array))
+
+
+def bits_to_symbols(bit_array, bit_length):
+    """Groups a flat bit array into symbols of bit_length bits each, most significant bit first, returning their
+    integer values.
+    """
+
+    if bit_array.size % bit_length:
+        raise ValueError(f'{bit_array.size} bits cannot be evenly split into {bit_length} bit symbols.')
+    return bit_array.reshape(-1, bit_length).dot(1 << numpy.arange(bit_length - 1, -1, -1))
+
+
+def symbols_to_bits(symbols, bit_length):
+    """The opposite of bits_to_symbols(), expanding each symbol into bit_length bits."""
+    shifts = numpy.arange(bit_length - 1, -1, -1)
+    return ((numpy.asarray(symbols)[:, numpy.newaxis] >> shifts) & 1).astype(numpy.uint8).reshape(-1)
+
+
+def bits_to_rgb(bit_array):
+    """24 bit palettes carry their data in the colors themselves, 8 bits per channel in red, green, blue order.  This
+    returns the (n, 3) array of colors for a flat bit array.
+    """
+
+    if bit_array.size % 24:
+        raise ValueError(f'{bit_array.size} bits cannot be evenly split into 24 bit colors.')
+    return numpy.packbits(bit_array.reshape(-1, 3, 8), axis=2).reshape(-1, 3)
+
+
+def rgb_to_bits(colors):
+    """The opposite of bits_to_rgb(), returning the flat bit array carried by an (n, 3) array of colors."""
+    return numpy.unpackbits(numpy.asarray(colors, dtype=numpy.uint8).reshape(-1, 3), axis=1).reshape(-1)
+
+
+def return_aligned_bytes(source_bytes, bit_start, bit_length):
+    """Returns bit_length bits of source_bytes starting at bit_start, shifted so they start on a byte boundary.  Bits
+    past bit_length in the last byte are zeroed.  If bit_start is already byte aligned, this is a view rather than a
+    copy.
+    """
+
+    byte_start, bit_offset = divmod(bit_start, 8)
+    byte_length = (bit_length + 7) // 8
+    source = numpy.frombuffer(source_bytes, dtype=numpy.uint8)
+
+    if not bit_offset:
+        aligned = source[byte_start:byte_start + byte_length]
+    else:
+        window = source[byte_start:byte_start + byte_length + 1]
+        if window.size < byte_length + 1:
+            window = numpy.concatenate((window, numpy.zeros(byte_length + 1 - window.size, dtype=numpy.uint8)))
+        aligned = (window[:-1] << numpy.uint8(bit_offset)) | (window[1:] >> numpy.uint8(8 - bit_offset))
+
+    if bit_length % 8:
+        if not bit_offset:  # Views of the source are read only
+            aligned = aligned.copy()
+        aligned[-1] &= numpy.uint8((0xFF << (8 - bit_length % 8)) & 0xFF)
+    return aligned
+
+
+class BitRangeWriter:
+    """Writes ranges of bits, taken from any position of their source bytes, one after the other into a file.  Bits
+    are shifted into place with numpy a whole range at a time, and byte aligned ranges are written straight from their
+    source.  Only whole bytes are written; any bits left over at the end are dropped.
+    """
+
+    def __init__(self, file_writer):
+        self.file_writer = file_writer
+        self.pending_byte = numpy.uint8(0)
+        self.pending_bit_count = 0
+
+    def write_bits(self, source_bytes, bit_start, bit_length):
+        if bit_length <= 0:
+            return
+
+        # Byte aligned on both ends, so nothing to shift
+        if not self.pending_bit_count and not bit_start % 8 and not bit_length % 8:
+            self.file_writer.write(memoryview(source_bytes)[bit_start // 8:(bit_start + bit_length) // 8])
+            return
+
+        aligned = return_aligned_bytes(source_bytes, bit_start, bit_length)
+        pending_bit_count = self.pending_bit_count
+        if pending_bit_count:
+            shift = numpy.uint8(pending_bit_count)
+            joined = numpy.empty(aligned.size + 1, dtype=numpy.uint8)
+            joined[0] = self.pending_byte | (aligned[0] >> shift)
+            joined[1:-1] = (aligned[:-1] << numpy.uint8(8 - pending_bit_count)) | (aligned[1:] >> shift)
+            joined[-1] = aligned[-1] << numpy.uint8(8 - pending_bit_count)
+            aligned = joined
+
+        total_bit_count = pending_bit_count + bit_length
+        full_bytes = total_bit_count // 8
+        self.file_writer.write(aligned[:full_bytes].tobytes())
+        self.pending_bit_count = total_bit_count % 8
+        self.pending_byte = aligned[full_bytes] if self.pending_bit_count else numpy.uint8(0)
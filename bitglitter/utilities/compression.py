@@ -1,8 +1,98 @@
+import lzma
 import os
 import zlib
 
+try:
+    import zstandard
+except ImportError:  # zstd is optional, and only available when the zstandard package is installed
+    zstandard = None
 
-def compress_file(input_file, output_file, write_mode, remove_input=True):
+
+COMPRESSION_CODECS = ('zlib', 'zstd', 'lzma', 'none')
+
+# Auto skip compresses a few samples spread across each file, and stores the file as is if it shrinks by less than this.
+AUTO_SKIP_SAMPLE_SIZE = 131072
+AUTO_SKIP_SAMPLE_COUNT = 3
+AUTO_SKIP_MINIMUM_SAVINGS = 0.05
+
+
+class _StoredCodec:
+    """Stands in for a compressor or decompressor when data is stored as is."""
+
+    def compress(self, data):
+        return data
+
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+
+def is_compression_codec_available(codec):
+    return codec in COMPRESSION_CODECS and (codec != 'zstd' or zstandard is not None)
+
+
+def return_compressor(codec='zlib'):
+    """Returns a compressor object for the codec, all of which share the compress() and flush() methods."""
+
+    if not is_compression_codec_available(codec):
+        raise ValueError(f'Compression codec {codec} is not available.')
+    if codec == 'zlib':
+        return zlib.compressobj(9)
+    elif codec == 'zstd':
+        return zstandard.ZstdCompressor(level=9).compressobj()
+    elif codec == 'lzma':
+        return lzma.LZMACompressor()
+    return _StoredCodec()
+
+
+def return_decompressor(codec='zlib'):
+    """Returns a decompressor object for the codec.  Not all of them have flush(), so check before calling it."""
+
+    if not is_compression_codec_available(codec):
+        raise ValueError(f'Compression codec {codec} is not available.')
+    if codec == 'zlib':
+        return zlib.decompressobj()
+    elif codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj()
+    elif codec == 'lzma':
+        return lzma.LZMADecompressor()
+    return _StoredCodec()
+
+
+def is_compression_worthwhile(input_file, codec='zlib'):
+    """Estimates if compressing the file is worth the time by compressing samples from its start, middle, and end rather
+    than all of it.  Already compressed data such as video, images, and archives won't get any smaller, and is better
+    stored as is.
+    """
+
+    file_size = os.path.getsize(input_file)
+    if not file_size:
+        return False
+
+    if file_size <= AUTO_SKIP_SAMPLE_SIZE * AUTO_SKIP_SAMPLE_COUNT:
+        sample_size = file_size
+        offsets = [0]
+    else:
+        sample_size = AUTO_SKIP_SAMPLE_SIZE
+        step = (file_size - sample_size) // (AUTO_SKIP_SAMPLE_COUNT - 1)
+        offsets = [sample * step for sample in range(AUTO_SKIP_SAMPLE_COUNT)]
+
+    sampled_size = 0
+    compressed_size = 0
+    with open(input_file, 'rb') as file_to_sample:
+        for offset in offsets:
+            file_to_sample.seek(offset)
+            sample = file_to_sample.read(sample_size)
+            compressor = return_compressor(codec)
+            compressed_size += len(compressor.compress(sample)) + len(compressor.flush())
+            sampled_size += len(sample)
+
+    return compressed_size <= sampled_size * (1 - AUTO_SKIP_MINIMUM_SAVINGS)
+
+
+def compress_file(input_file, output_file, write_mode, remove_input=True, codec='zlib'):
     """This inputs a file, and writes a compressed one, removing the input file afterwards by default."""
     if write_mode == 'write':
         mode = 'wb'
@@ -11,7 +101,7 @@ def compress_file(input_file, output_file, write_mode, remove_input=True):
     else:
         raise ValueError('\'write\' and \'append\' are the only allowed strings for write_mode.')
 
-    compressor = zlib.compressobj(9)
+    compressor = return_compressor(codec)
     with open(input_file, 'rb') as decompressed:
         with open(output_file, mode) as compressed:
             chunk_size = 1000000
@@ -32,12 +122,12 @@ def compress_bytes(input_bytes):
     return compressed
 
 
-def decompress_file(input_file, output_file, remove_input=True):
+def decompress_file(input_file, output_file, remove_input=True, codec='zlib'):
     """Doing the opposite as compress_file(), this inputs a compressed file, and writes a decompressed one, while
     removing the original file by default.
     """
 
-    decompressor = zlib.decompressobj()
+    decompressor = return_decompressor(codec)
     with open(input_file, 'rb') as compressed:
         with open(output_file, 'wb') as decompressed:
             chunk_size = 1000000
@@ -46,7 +136,8 @@ def decompress_file(input_file, output_file, remove_input=True):
                 if chunk:
                     decompressed.write(decompressor.decompress(chunk))
                 else:
-                    decompressed.write(decompressor.flush())
+                    if hasattr(decompressor, 'flush'):
+                        decompressed.write(decompressor.flush())
                     break
 
     if remove_input:
@@ -1,18 +1,37 @@
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.ciphers import Cipher, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.ciphers.algorithms import AES
 from cryptography.hazmat.primitives.padding import PKCS7
 from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import hashlib
 from io import BytesIO
+import math
 import os
 
 
+# Format of encrypted files.  Version 1 encrypts each 1 MiB of the file with AES-CBC on its own, all sharing an IV.
+# Version 2 authenticates each 1 MiB with AES-GCM, each with its own nonce, so any chunk can be decrypted on its own.
+ENCRYPTION_VERSION = 2
+AEAD_CHUNK_SIZE = 1048576
+AEAD_TAG_SIZE = 16
+AEAD_NONCE_PREFIX_SIZE = 8
+AEAD_NONCE_SIZE = 12
+AEAD_HEADER_SIZE = 16 + AEAD_NONCE_PREFIX_SIZE  # Salt, then nonce prefix
+LEGACY_CHUNK_SIZE = 1048576
+
+
 def encrypt_file(input_file, output_file, write_mode, encryption_key, scrypt_n=14, scrypt_r=8, scrypt_p=1,
-                 remove_input=True):
+                 remove_input=True, stream_key_salt=None):
     """Taking an input file as well as the ASCII encryption key, the file is encrypted with AES-256, and outputted to
-    output_file.  The input file is removed by default.
+    output_file.  The input file is removed by default.  If stream_key_salt is given, the file's key is derived from the
+    stream key rather than running scrypt for this file alone.
     """
     if write_mode == 'write':
         mode = 'wb'
@@ -21,28 +40,100 @@ def encrypt_file(input_file, output_file, write_mode, encryption_key, scrypt_n=1
     else:
         raise ValueError('\'write\' and \'append\' are the only allowed strings for write_mode.')
 
-    backend = default_backend()
-    initialization_vector = os.urandom(AES.block_size // 8)
-    salt = os.urandom(AES.block_size // 8)
-    key = _derive_key(encryption_key, salt, scrypt_n, scrypt_r, scrypt_p, backend)
-
+    encryptor = StreamEncryptor(encryption_key, scrypt_n, scrypt_r, scrypt_p, stream_key_salt)
     with open(output_file, mode) as encrypted:
         with open(input_file, 'rb') as decrypted:
-            encrypted.write(initialization_vector)
-            encrypted.write(salt)
-
-            chunk_size = 1048576
             while True:
-                chunk = decrypted.read(chunk_size)
+                chunk = decrypted.read(AEAD_CHUNK_SIZE)
                 if chunk:
-                    encrypted.write(_encrypt_bytes_chunk(key, initialization_vector, chunk, backend))
+                    encrypted.write(encryptor.update(chunk))
                 else:
+                    encrypted.write(encryptor.finalize())
                     break
 
     if remove_input:
         os.remove(input_file)
 
 
+def _return_chunk_nonce(nonce_prefix, chunk_index):
+    return nonce_prefix + chunk_index.to_bytes(AEAD_NONCE_SIZE - AEAD_NONCE_PREFIX_SIZE, 'big')
+
+
+def _return_chunk_associated_data(is_final):
+    """The last chunk is authenticated as such, so a file cut short at a chunk boundary fails rather than decrypting."""
+    return b'\x01' if is_final else b'\x00'
+
+
+class StreamEncryptor:
+    """Encrypts data as it's fed in rather than from a file, in the version 2 format: the salt and nonce prefix,
+    followed by each 1 MiB of data encrypted with AES-GCM.  Each chunk's nonce is the prefix plus its chunk number.
+    Data is held until a full chunk is available, so it can be fed in pieces of any size.  If stream_key_salt is given,
+    the key is derived from the stream key.
+    """
+
+    def __init__(self, encryption_key, scrypt_n=14, scrypt_r=8, scrypt_p=1, stream_key_salt=None):
+        salt = os.urandom(16)
+        self.nonce_prefix = os.urandom(AEAD_NONCE_PREFIX_SIZE)
+        self.cipher = AESGCM(_return_file_key(encryption_key, salt, scrypt_n, scrypt_r, scrypt_p, default_backend(),
+                                              stream_key_salt))
+        self.chunk_index = 0
+        self.pending_output = salt + self.nonce_prefix
+        self.buffer = bytearray()
+
+    def _encrypt_chunk(self, chunk, is_final):
+        nonce = _return_chunk_nonce(self.nonce_prefix, self.chunk_index)
+        self.chunk_index += 1
+        return self.cipher.encrypt(nonce, chunk, _return_chunk_associated_data(is_final))
+
+    def update(self, data):
+        """Returns whatever encrypted data is ready after adding data.  A full chunk is held back until there is more
+        data after it, as the last chunk is only encrypted in finalize().
+        """
+
+        self.buffer += data
+        returned_bytes = self.pending_output
+        self.pending_output = b''
+        while len(self.buffer) > AEAD_CHUNK_SIZE:
+            returned_bytes += self._encrypt_chunk(bytes(self.buffer[:AEAD_CHUNK_SIZE]), False)
+            del self.buffer[:AEAD_CHUNK_SIZE]
+        return returned_bytes
+
+    def finalize(self):
+        """Returns the remaining encrypted data, once all data has been added."""
+
+        returned_bytes = self.update(b'') + self._encrypt_chunk(bytes(self.buffer), True)
+        self.buffer = bytearray()
+        return returned_bytes
+
+
+class StreamDecryptor:
+    """Decrypts files in the version 2 format.  Chunks are at fixed positions and carry their own nonce, so any chunk
+    can be decrypted on its own and in any order, given the file's header.
+    """
+
+    def __init__(self, header_bytes, encryption_key, scrypt_n=14, scrypt_r=8, scrypt_p=1, stream_key_salt=None):
+        salt = header_bytes[:16]
+        self.nonce_prefix = header_bytes[16:AEAD_HEADER_SIZE]
+        self.cipher = AESGCM(_return_file_key(encryption_key, salt, scrypt_n, scrypt_r, scrypt_p, default_backend(),
+                                              stream_key_salt))
+
+    @staticmethod
+    def return_chunk_position(chunk_index):
+        """Returns the byte position of a chunk within the encrypted file."""
+        return AEAD_HEADER_SIZE + chunk_index * (AEAD_CHUNK_SIZE + AEAD_TAG_SIZE)
+
+    @staticmethod
+    def return_total_chunks(encrypted_size):
+        return max(1, math.ceil((encrypted_size - AEAD_HEADER_SIZE) / (AEAD_CHUNK_SIZE + AEAD_TAG_SIZE)))
+
+    def decrypt_chunk(self, chunk_index, encrypted_chunk, is_final):
+        try:
+            return self.cipher.decrypt(_return_chunk_nonce(self.nonce_prefix, chunk_index), encrypted_chunk,
+                                       _return_chunk_associated_data(is_final))
+        except InvalidTag:
+            raise ValueError('Chunk could not be authenticated, either the key is incorrect or the data is corrupted.')
+
+
 def encrypt_bytes(input_bytes, encryption_key, scrypt_n=14, scrypt_r=8, scrypt_p=1):
     backend = default_backend()
     initialization_vector_aes = os.urandom(AES.block_size // 8)
@@ -57,28 +148,63 @@ def encrypt_bytes(input_bytes, encryption_key, scrypt_n=14, scrypt_r=8, scrypt_p
     return encrypted_bytes
 
 
+def encrypt_header_bytes(input_bytes, encryption_key, stream_key_salt, scrypt_n=14, scrypt_r=8, scrypt_p=1):
+    """Encrypts the metadata header with AES-GCM, using a key derived from the stream key with HKDF.  The stream key
+    salt comes first, as the manifest holding it is inside the header, followed by the nonce.
+    """
+
+    nonce = os.urandom(AEAD_NONCE_SIZE)
+    stream_key = derive_stream_key(encryption_key, stream_key_salt, scrypt_n, scrypt_r, scrypt_p)
+    cipher = AESGCM(_derive_header_key(stream_key, default_backend()))
+    return stream_key_salt + nonce + cipher.encrypt(nonce, input_bytes, None)
+
+
 def decrypt_file(input_file, output_file, encryption_key, scrypt_n=14, scrypt_r=8, scrypt_p=1,
-                 remove_input=True):
-    """Taking an input file as well as an encryption key, this function decrypts and saves the file."""
+                 remove_input=True, stream_key_salt=None, encryption_version=ENCRYPTION_VERSION, max_workers=None):
+    """Taking an input file as well as an encryption key, this function decrypts and saves the file.  stream_key_salt
+    must be given for files encrypted with a key derived from the stream key.  Version 2 files are decrypted several
+    chunks at a time across threads.
+    """
+
+    if encryption_version == 1:
+        _decrypt_legacy_file(input_file, output_file, encryption_key, scrypt_n, scrypt_r, scrypt_p, stream_key_salt)
+    else:
+        encrypted_size = os.path.getsize(input_file)
+        max_workers = max_workers if max_workers else os.cpu_count()
+        with open(output_file, 'wb') as decrypted:
+            with open(input_file, 'rb') as encrypted:
+                decryptor = StreamDecryptor(encrypted.read(AEAD_HEADER_SIZE), encryption_key, scrypt_n, scrypt_r,
+                                            scrypt_p, stream_key_salt)
+                total_chunks = decryptor.return_total_chunks(encrypted_size)
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    for batch_start in range(0, total_chunks, max_workers):
+                        chunk_indexes = range(batch_start, min(batch_start + max_workers, total_chunks))
+                        encrypted_chunks = [encrypted.read(AEAD_CHUNK_SIZE + AEAD_TAG_SIZE) for _ in chunk_indexes]
+                        is_final_chunks = [chunk_index == total_chunks - 1 for chunk_index in chunk_indexes]
+                        for chunk in executor.map(decryptor.decrypt_chunk, chunk_indexes, encrypted_chunks,
+                                                  is_final_chunks):
+                            decrypted.write(chunk)
+
+    if remove_input:
+        os.remove(input_file)
+
+
+def _decrypt_legacy_file(input_file, output_file, encryption_key, scrypt_n, scrypt_r, scrypt_p, stream_key_salt):
+    """Decrypts files in the version 1 format.  Every 1 MiB chunk was padded on its own, taking up an extra block."""
 
     backend = default_backend()
     with open(output_file, 'wb') as decrypted:
         with open(input_file, 'rb') as encrypted:
             initialization_vector = encrypted.read(AES.block_size // 8)
             salt = encrypted.read(AES.block_size // 8)
-            key = _derive_key(encryption_key, salt, scrypt_n, scrypt_r, scrypt_p, backend)
-            chunk_size = 1048576
+            key = _return_file_key(encryption_key, salt, scrypt_n, scrypt_r, scrypt_p, backend, stream_key_salt)
             while True:
-                chunk = encrypted.read(chunk_size)
+                chunk = encrypted.read(LEGACY_CHUNK_SIZE + AES.block_size // 8)
                 if chunk:
-                    decrypted.write(_decrypt_bytes_chunk(key, initialization_vector, chunk, backend,
-                                                         chunk_size=chunk_size))
+                    decrypted.write(_decrypt_bytes_chunk(key, initialization_vector, chunk, backend))
                 else:
                     break
 
-    if remove_input:
-        os.remove(input_file)
-
 
 def decrypt_bytes(input_bytes, encryption_key, scrypt_n=14, scrypt_r=8, scrypt_p=1):
     backend = default_backend()
@@ -87,13 +213,11 @@ def decrypt_bytes(input_bytes, encryption_key, scrypt_n=14, scrypt_r=8, scrypt_p
         initialization_vector = encrypted.read(AES.block_size // 8)
         salt = encrypted.read(AES.block_size // 8)
         key = _derive_key(encryption_key, salt, scrypt_n, scrypt_r, scrypt_p, backend)
-        chunk_size = 1048576
         try:
             while True:
-                chunk = encrypted.read(chunk_size)
+                chunk = encrypted.read(LEGACY_CHUNK_SIZE + AES.block_size // 8)
                 if chunk:
-                    returned_bytes += (_decrypt_bytes_chunk(key, initialization_vector, chunk, backend,
-                                                         chunk_size=chunk_size))
+                    returned_bytes += _decrypt_bytes_chunk(key, initialization_vector, chunk, backend)
                 else:
                     break
         #  Incorrect decryption values
@@ -101,6 +225,24 @@ def decrypt_bytes(input_bytes, encryption_key, scrypt_n=14, scrypt_r=8, scrypt_p
             return None
     return returned_bytes
 
+
+def decrypt_header_bytes(input_bytes, encryption_key, scrypt_n=14, scrypt_r=8, scrypt_p=1):
+    """Decrypts a metadata header from encrypt_header_bytes(), returning None if the values are incorrect.  Headers that
+    fail to authenticate are tried as the older format from encrypt_bytes(), which has nothing marking it apart.
+    """
+
+    salt = input_bytes[:16]
+    nonce = input_bytes[16:16 + AEAD_NONCE_SIZE]
+    if len(input_bytes) >= 16 + AEAD_NONCE_SIZE + AEAD_TAG_SIZE:
+        stream_key = derive_stream_key(encryption_key, salt, scrypt_n, scrypt_r, scrypt_p)
+        cipher = AESGCM(_derive_header_key(stream_key, default_backend()))
+        try:
+            return cipher.decrypt(nonce, input_bytes[16 + AEAD_NONCE_SIZE:], None)
+        except InvalidTag:
+            pass
+    return decrypt_bytes(input_bytes, encryption_key, scrypt_n, scrypt_r, scrypt_p)
+
+
 def _encrypt_bytes_chunk(key, initialization_vector, data, backend):
     """This is an internal function used in encrypt_file(), and for future functionality of this program.  It returns
     32 bytes of encrypted data.
@@ -112,18 +254,15 @@ def _encrypt_bytes_chunk(key, initialization_vector, data, backend):
     return encryptor.update(padder.update(data) + padder.finalize()) + encryptor.finalize()
 
 
-def _decrypt_bytes_chunk(key, initialization_vector_aes, data, backend, chunk_size=None):
+def _decrypt_bytes_chunk(key, initialization_vector_aes, data, backend):
     """This is an internal function used in decrypt_file(), and for future functionality of this program.  It returns
-    32 bytes of decrypted data.
+    32 bytes of decrypted data.  Every chunk was padded when encrypted, so each one is unpadded in full.
     """
 
     cipher = Cipher(AES(key), modes.CBC(initialization_vector_aes), backend=backend)
     unpadder = PKCS7(AES.block_size).unpadder()
     decryptor = cipher.decryptor()
-    if len(data) == chunk_size:
-        return unpadder.update(decryptor.update(data) + decryptor.finalize())
-    else:
-        return unpadder.update(decryptor.update(data) + decryptor.finalize()) + unpadder.finalize()
+    return unpadder.update(decryptor.update(data) + decryptor.finalize()) + unpadder.finalize()
 
 
 def _derive_key(password, salt, scrypt_n, scrypt_r, scrypt_p, backend):
@@ -131,11 +270,45 @@ def _derive_key(password, salt, scrypt_n, scrypt_r, scrypt_p, backend):
     returns a proper AES key in byte format.
     """
 
+    return derive_stream_key(password, salt, scrypt_n, scrypt_r, scrypt_p)
+
+
+@functools.lru_cache(maxsize=64)
+def derive_stream_key(password, salt, scrypt_n=14, scrypt_r=8, scrypt_p=1):
+    """Runs scrypt on the password.  This is by far the slowest part of encryption, so results are kept in memory, and
+    any later derivations with the same values (such as re-attempting a metadata header) are instant.
+    """
+
     kdf = Scrypt(salt=salt, length=32, n=2 ** scrypt_n, r=scrypt_r, p=scrypt_p,
-                 backend=backend)
+                 backend=default_backend())
     return kdf.derive(password.encode())
 
 
+def _derive_file_key(stream_key, file_salt, backend):
+    """Derives a file's key from the stream key with HKDF, which unlike scrypt takes next to no time."""
+
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=file_salt, info=b'BitGlitter file key', backend=backend)
+    return hkdf.derive(stream_key)
+
+
+def _derive_header_key(stream_key, backend):
+    """Derives the metadata header's key from the stream key with HKDF, under a different label than the file keys."""
+
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b'BitGlitter metadata header', backend=backend)
+    return hkdf.derive(stream_key)
+
+
+def _return_file_key(password, file_salt, scrypt_n, scrypt_r, scrypt_p, backend, stream_key_salt=None):
+    """Streams with a stream key salt run scrypt once for the stream, with each file's key derived from it.  Older
+    streams run scrypt for every file with its own salt.
+    """
+
+    if stream_key_salt:
+        stream_key = derive_stream_key(password, stream_key_salt, scrypt_n, scrypt_r, scrypt_p)
+        return _derive_file_key(stream_key, file_salt, backend)
+    return _derive_key(password, file_salt, scrypt_n, scrypt_r, scrypt_p, backend)
+
+
 def get_hash_from_file(file_path, byte_output=False):
     """Taking in a path to a file as an argument, it returns the SHA-256 hash of the file via a string."""
     sha256 = hashlib.sha256()
@@ -0,0 +1,36 @@
+import bisect
+
+
+class IntervalSet:
+    """A set of integers stored as sorted, non-overlapping inclusive ranges.  Ranges that overlap or touch are merged as
+    they're added, so the set always holds the fewest ranges possible.  Used to track which bit ranges of a stream's
+    payload have been read.
+    """
+
+    def __init__(self, ranges=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(ranges):
+            self.add(start, end)
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, end):
+        # First and last existing ranges that overlap or touch the new one
+        first_index = bisect.bisect_left(self.ends, start - 1)
+        last_index = bisect.bisect_right(self.starts, end + 1)
+
+        if first_index < last_index:
+            start = min(start, self.starts[first_index])
+            end = max(end, self.ends[last_index - 1])
+        self.starts[first_index:last_index] = [start]
+        self.ends[first_index:last_index] = [end]
+
+    def covers(self, start, end):
+        """Returns True if every integer from start through end is in the set."""
+        index = bisect.bisect_right(self.starts, start) - 1
+        return index >= 0 and self.ends[index] >= end
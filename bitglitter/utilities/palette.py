@@ -25,6 +25,7 @@ class BitsToColor:
         self.color_set_tupled = color_set_tupled
         self.bit_length = bit_length
         self.return_value = self.generate_dictionary()
+        self.color_table = self.generate_color_table()
 
     @staticmethod
     def twenty_four_bit_values(bit_value):
@@ -48,6 +49,9 @@ class BitsToColor:
         else:
             return self.twenty_four_bit_values
 
+    def generate_color_table(self):
+        return return_color_table(self.color_set_tupled, self.bit_length)
+
     def get_color(self, value):
 
         if self.bit_length != 24:
@@ -95,6 +99,18 @@ class ColorsToBits:
             return self.return_value(color)
 
 
+def return_color_table(color_set_tupled, bit_length):
+    """Returns the palette as an array indexed by symbol value, with the channels in BGR order as OpenCV expects.
+    This lets the renderer color an entire frame in a single lookup rather than one block at a time.  24 bit palettes
+    don't have a table, as the symbol itself is the color.
+    """
+
+    if bit_length != 24:
+        return numpy.array(color_set_tupled, dtype=numpy.uint8)[:, ::-1]
+    else:
+        return None
+
+
 def convert_hex_to_rgb(color_set):
     """Takes the palette color set, converts any hex values into tuples, and returns a integer tuple of the R/G/B
     color channels.
@@ -1,7 +1,125 @@
-from bitglitter.config.config import session
+from sqlalchemy.dialects.sqlite import insert
+
+import logging
+import queue
+import threading
+import time
+
+from bitglitter.config.config import session, Session
+from bitglitter.config.configmodels import Statistics
 from bitglitter.config.readmodels.readmodels import StreamFrame
 
+# Frame results are persisted once this many are pending, or once the oldest has waited this long.
+FRAME_BATCH_SIZE = 64
+FRAME_BATCH_MILLISECONDS = 500
+
 
 def flush_inactive_frames():
     session.query(StreamFrame).filter(StreamFrame.is_complete == False).delete()
     session.commit()
+
+
+class FrameResultBatch:
+    """Frames decoded by worker processes aren't saved by the workers themselves.  Their results are collected here,
+    and persisted together in a single transaction every FRAME_BATCH_SIZE frames or FRAME_BATCH_MILLISECONDS, rather
+    than with several commits per frame.  Frames already saved by this batch are remembered, so repeats of them are
+    dropped without going to the database.
+    """
+
+    def __init__(self, batch_session=session, batch_size=FRAME_BATCH_SIZE,
+                 batch_milliseconds=FRAME_BATCH_MILLISECONDS):
+        self.batch_session = batch_session
+        self.batch_size = batch_size
+        self.batch_seconds = batch_milliseconds / 1000
+        self.pending_frame_results = []
+        self.oldest_pending_time = None
+        self.saved_frames = set()
+
+    def add(self, frame_results):
+        if not frame_results or (frame_results['stream_id'], frame_results['frame_number']) in self.saved_frames:
+            return
+        if not self.pending_frame_results:
+            self.oldest_pending_time = time.monotonic()
+        self.pending_frame_results.append(frame_results)
+
+        if len(self.pending_frame_results) >= self.batch_size or \
+                time.monotonic() - self.oldest_pending_time >= self.batch_seconds:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_frame_results:
+            return
+
+        # Frames repeated within this batch, or saved meanwhile by another process, are only saved once.  The unique
+        # index on stream_id and frame_number decides.
+        saved_frame_results = []
+        for frame_results in self.pending_frame_results:
+            frame_key = (frame_results['stream_id'], frame_results['frame_number'])
+            if frame_key in self.saved_frames:
+                continue
+            self.saved_frames.add(frame_key)
+            frame_insert = insert(StreamFrame).values(
+                stream_id=frame_results['stream_id'], frame_number=frame_results['frame_number'],
+                payload_bits=frame_results['payload_bits'], payload=frame_results['payload'], is_complete=True,
+                added_to_progress=not frame_results['payload_bits'])
+            result = self.batch_session.execute(frame_insert.on_conflict_do_nothing(index_elements=['stream_id',
+                                                                                                   'frame_number']))
+            if result.rowcount:
+                saved_frame_results.append(frame_results)
+
+        statistics_results = [frame_results['statistics'] for frame_results in saved_frame_results
+                              if frame_results['statistics']]
+        if statistics_results:
+            stats = self.batch_session.query(Statistics).first()
+            stats.read_update(sum(blocks for blocks, payload_bits in statistics_results), len(statistics_results),
+                              sum(payload_bits for blocks, payload_bits in statistics_results), save=False)
+
+        self.batch_session.commit()
+        logging.debug(f'Saved {len(saved_frame_results)} frame(s) in one batch.')
+        self.pending_frame_results = []
+
+
+class FrameResultWriter:
+    """A single thread in the parent owns saving the frames returned by the read workers, so the workers themselves
+    never write to the database and never wait on each other's locks.  Results are handed over through a queue, and
+    saved in batches with FrameResultBatch on the thread's own session while the parent carries on handing out frames.
+    """
+
+    def __init__(self):
+        self.frame_results_queue = queue.Queue()
+        self.frame_result_batch = FrameResultBatch(batch_session=None)
+        self.writer_error = None
+        self.writer_thread = threading.Thread(target=self._write_frame_results, daemon=True)
+        self.writer_thread.start()
+
+    def add(self, frame_results):
+        if frame_results:
+            self.frame_results_queue.put(frame_results)
+
+    def close(self):
+        """Saves whatever is still pending, and stops the thread.  Errors raised while saving are raised here."""
+
+        self.frame_results_queue.put(None)
+        self.writer_thread.join()
+        if self.writer_error:
+            raise self.writer_error
+
+    def _write_frame_results(self):
+        # Sessions are per thread, so this one is separate from the parent's
+        self.frame_result_batch.batch_session = Session()
+        try:
+            while True:
+                try:
+                    frame_results = self.frame_results_queue.get(timeout=self.frame_result_batch.batch_seconds)
+                except queue.Empty:  # Nothing new for a while, saving what's pending
+                    self.frame_result_batch.flush()
+                    continue
+                if frame_results is None:
+                    break
+                self.frame_result_batch.add(frame_results)
+            self.frame_result_batch.flush()
+        except Exception as error:
+            logging.exception('Saving frame results failed.')
+            self.writer_error = error
+        finally:
+            Session.remove()
@@ -40,7 +40,7 @@ def _file_path_validate(file_path, type_requirement, video_formats, image_format
 def validate_read_parameters(file_path, output_path, encryption_key, scrypt_n, scrypt_r, scrypt_p,
                              block_height_override, block_width_override, max_cpu_cores, save_statistics,
                              bad_frame_strikes, stop_at_metadata_load, auto_unpackage_stream,
-                             auto_delete_finished_stream):
+                             auto_delete_finished_stream, partitioned_video_read, skip_repeated_frames):
     """This function verifies the arguments going into read() to ensure they comform with the required format for
     processing.
     """
@@ -85,6 +85,8 @@ def validate_read_parameters(file_path, output_path, encryption_key, scrypt_n, s
     is_bool('stop_at_metadata_load', stop_at_metadata_load)
     is_bool('auto_unpackage_stream', auto_unpackage_stream)
     is_bool('auto_delete_finished_stream', auto_delete_finished_stream)
+    is_bool('partitioned_video_read', partitioned_video_read)
+    is_bool('skip_repeated_frames', skip_repeated_frames)
     logging.debug("Read parameters validated.")
 
     return input_type
@@ -1,15 +1,46 @@
 import logging
 from pathlib import Path
+import shutil
 
 from bitglitter.config.palettefunctions import _return_palette
+from bitglitter.utilities.compression import COMPRESSION_CODECS, is_compression_codec_available
 from bitglitter.utilities.display import humanize_file_size
 from bitglitter.validation.utilities import is_bool, is_int_over_zero, is_valid_directory, proper_string_syntax, \
     verify_write_params_output_mode, verify_write_params_scrypt
 from bitglitter.validation.validatepalette import palette_geometry_verify
+from bitglitter.write.render.videorender import is_lossless_codec, VIDEO_CODECS
+
+
+def verify_write_params_video_codec(video_codec, video_crf, video_bitrate, video_gop):
+    if video_codec not in VIDEO_CODECS:
+        raise ValueError(f"Argument video_codec in write() only accepts {', '.join(VIDEO_CODECS)}.")
+
+    if video_crf is not None:
+        if video_codec != 'x264':
+            raise ValueError('Argument video_crf can only be used with the x264 codec.')
+        if not isinstance(video_crf, int) or not 0 <= video_crf <= 51:
+            raise ValueError('Argument video_crf must be an integer between 0 and 51.')
+
+    if video_bitrate is not None:
+        if VIDEO_CODECS[video_codec]['lossless']:
+            raise ValueError(f'Argument video_bitrate cannot be used with lossless codec {video_codec}.')
+        is_int_over_zero('video_bitrate', video_bitrate)
+
+    if video_gop is not None:
+        is_int_over_zero('video_gop', video_gop)
+
+
+def verify_write_params_compression(compression_codec, compression_auto_skip):
+    if compression_codec not in COMPRESSION_CODECS:
+        raise ValueError(f"Argument compression_codec in write() only accepts {', '.join(COMPRESSION_CODECS)}.")
+    if not is_compression_codec_available(compression_codec):
+        raise ValueError(f'Compression codec {compression_codec} requires the zstandard package to be installed.')
+    is_bool('compression_auto_skip', compression_auto_skip)
 
 
 def verify_write_params_render_values(stream_palette_id, stream_palette_nickname, pixel_width, block_height,
-                                      block_width, frames_per_second, output_mode, preset_validation):
+                                      block_width, frames_per_second, output_mode, preset_validation,
+                                      video_codec='mp4v', video_crf=None):
     palette = _return_palette(palette_id=stream_palette_id, palette_nickname=stream_palette_nickname)
 
     is_int_over_zero('pixel_width', pixel_width)
@@ -24,10 +55,12 @@ def verify_write_params_render_values(stream_palette_id, stream_palette_nickname
         raise ValueError(f'Frames must have more than 1500 blocks, this current config has'
                          f' {block_width * block_height}')
 
-    # TEMPORARY until issue is fixed
+    # 24 bit palettes have no tolerance for color distortion, so they need a lossless codec that can be written here.
     if output_mode == 'video' and palette.is_24_bit:
-        raise ValueError("24 bit palettes can not be used with videos at this time due to codec issues.  This is"
-                         "\nbeing worked on and will be restored soon!  This palette will still work on images.")
+        if not is_lossless_codec(video_codec, video_crf) or (not VIDEO_CODECS[video_codec]['fourcc'] and not
+                                                             shutil.which('ffmpeg')):
+            raise ValueError("24 bit palettes can only be used in videos with a lossless codec (ffv1, huffyuv, or x264"
+                             "\nwith ffmpeg installed).  This palette will still work on images.")
 
     # With the given dimensions and bit length, is it sufficient?
     payload_frame_percentage, bits_available_per_frame, output_per_sec = palette_geometry_verify(
@@ -47,7 +80,9 @@ def write_parameter_validate(input_path, stream_name, stream_description, stream
                              file_mask_enabled, encryption_key, max_cpu_cores=None, output_mode=None,
                              compression_enabled=None, scrypt_n=None, scrypt_r=None, scrypt_p=None,
                              stream_palette_id=None, stream_palette_nickname=None, pixel_width=None, block_height=None,
-                             block_width=None, frames_per_second=None, preset_used=False):
+                             block_width=None, frames_per_second=None, video_codec='mp4v', video_crf=None,
+                             video_bitrate=None, video_gop=None, compression_codec='zlib', compression_auto_skip=False,
+                             preset_used=False):
     """This function verifies all write() parameters.  Look at this as the gatekeeper that stops invalid arguments from
      proceeding through the process, potentially breaking the stream (or causing BitGlitter to crash).
     """
@@ -61,7 +96,8 @@ def write_parameter_validate(input_path, stream_name, stream_description, stream
 
     if not preset_used:
         verify_write_params_render_values(stream_palette_id, stream_palette_nickname, pixel_width, block_height,
-                                          block_width, frames_per_second, output_mode, preset_validation=False)
+                                          block_width, frames_per_second, output_mode, preset_validation=False,
+                                          video_codec=video_codec, video_crf=video_crf)
         verify_write_params_output_mode(output_mode)
         is_bool('compression_enabled', compression_enabled)
         verify_write_params_scrypt(scrypt_n, scrypt_r, scrypt_p)
@@ -81,6 +117,8 @@ def write_parameter_validate(input_path, stream_name, stream_description, stream
     if stream_output_path:
         is_valid_directory('stream_output_path', stream_output_path)
     verify_write_params_output_mode(output_mode)
+    verify_write_params_video_codec(video_codec, video_crf, video_bitrate, video_gop)
+    verify_write_params_compression(compression_codec, compression_auto_skip)
     logging.info("Write parameters validated.")
 
     if not isinstance(max_cpu_cores, int) or max_cpu_cores < 0:
@@ -1,12 +1,68 @@
 import logging
+import hashlib
+from multiprocessing import cpu_count, Pool
 import os
 
-from bitglitter.utilities.compression import compress_file
-from bitglitter.utilities.cryptography import encrypt_file, get_hash_from_file
+from bitglitter.utilities.compression import is_compression_worthwhile, return_compressor
+from bitglitter.utilities.cryptography import StreamEncryptor
 
 
 def directory_crawler(directory_path, payload_directory, compression_enabled, crypto_key, scrypt_n,
-                      scrypt_r, scrypt_p):
+                      scrypt_r, scrypt_p, max_cpu_cores=1, stream_hasher=None, compression_codec='zlib',
+                      compression_auto_skip=False, stream_key_salt=None):
+    """Builds the manifest for the directory, and processes all files within it.  Files are processed across a pool of
+    workers, each writing to its own segment file, and the segments are appended to processed.bin in manifest order so
+    the result is the same as processing them one at a time.  If stream_hasher is given, it's updated with all bytes
+    written to processed.bin.
+    """
+
+    file_queue = []
+    manifest = _directory_manifest_setup(directory_path, file_queue)
+
+    if max_cpu_cores == 0 or max_cpu_cores >= cpu_count():
+        pool_size = cpu_count()
+    else:
+        pool_size = max_cpu_cores
+
+    if pool_size > 1 and len(file_queue) > 1:
+        file_tasks = [{'file_abs_path': file_abs_path, 'payload_directory': payload_directory, 'crypto_key':
+                       crypto_key, 'scrypt_n': scrypt_n, 'scrypt_r': scrypt_r, 'scrypt_p': scrypt_p,
+                       'compression_enabled': compression_enabled, 'compression_codec': compression_codec,
+                       'compression_auto_skip': compression_auto_skip, 'stream_key_salt': stream_key_salt,
+                       'segment_index': segment_index}
+                      for segment_index, (file_abs_path, file_manifest) in enumerate(file_queue)]
+        stream_payload_write_path = payload_directory / 'processed.bin'
+
+        with Pool(processes=min(pool_size, len(file_queue))) as worker_pool:
+            logging.info(f'Processing {len(file_queue)} files on {min(pool_size, len(file_queue))} CPU core(s)...')
+            for (file_abs_path, file_manifest), (returned_manifest, segment_path) in \
+                    zip(file_queue, worker_pool.imap(process_file_segment, file_tasks)):
+                file_manifest.update(returned_manifest)
+                with open(stream_payload_write_path, 'ab') as byte_write:
+                    with open(segment_path, 'rb') as byte_read:
+                        while True:
+                            chunk = byte_read.read(1000000)
+                            if not chunk:
+                                break
+                            byte_write.write(chunk)
+                            if stream_hasher:
+                                stream_hasher.update(chunk)
+                os.remove(segment_path)
+
+    else:
+        for file_abs_path, file_manifest in file_queue:
+            file_manifest.update(process_file(file_abs_path, payload_directory, crypto_key, scrypt_n, scrypt_r,
+                                              scrypt_p, compression_enabled, compression_codec, compression_auto_skip,
+                                              stream_hasher=stream_hasher, stream_key_salt=stream_key_salt))
+
+    return manifest
+
+
+def _directory_manifest_setup(directory_path, file_queue):
+    """Recursively lays out the directory manifest.  Each file gets an empty manifest that is filled in once it's
+    processed, and is added to file_queue along with its path, in the order the files are to be written.
+    """
+
     logging.info(f'Scanning {directory_path}...')
     manifest = {}
     # Directory keys:
@@ -28,23 +84,45 @@ def directory_crawler(directory_path, payload_directory, compression_enabled, cr
     file_manifests = []
     if files:
         for file in files:
-            returned_manifest = process_file(file, payload_directory, crypto_key, scrypt_n, scrypt_r, scrypt_p,
-                                             compression_enabled)
-            file_manifests.append(returned_manifest)
+            file_manifest = {}
+            file_queue.append((file, file_manifest))
+            file_manifests.append(file_manifest)
         manifest['f'] = file_manifests
 
     directory_manifests = []
     if subdirectories:
         for subdirectory in subdirectories:
-            returned_manifest = directory_crawler(subdirectory, payload_directory, compression_enabled, crypto_key,
-                                                  scrypt_n, scrypt_r, scrypt_p)
+            returned_manifest = _directory_manifest_setup(subdirectory, file_queue)
             directory_manifests.append(returned_manifest)
         manifest['s'] = directory_manifests
 
     return manifest
 
 
-def process_file(file_abs_path, payload_directory, crypto_key, scrypt_n, scrypt_r, scrypt_p, compression_enabled):
+def process_file_segment(dict_obj):
+    """Processes a single file in a worker process, into its own segment file rather than processed.bin.  A single
+    argument must be passed here because multiprocessing's imap requires it.
+    """
+
+    segment_index = dict_obj['segment_index']
+    manifest = process_file(dict_obj['file_abs_path'], dict_obj['payload_directory'], dict_obj['crypto_key'],
+                            dict_obj['scrypt_n'], dict_obj['scrypt_r'], dict_obj['scrypt_p'],
+                            dict_obj['compression_enabled'], dict_obj['compression_codec'],
+                            dict_obj['compression_auto_skip'], segment_index=segment_index,
+                            stream_key_salt=dict_obj['stream_key_salt'])
+    return manifest, dict_obj['payload_directory'] / f'segment {segment_index}.bin'
+
+
+def process_file(file_abs_path, payload_directory, crypto_key, scrypt_n, scrypt_r, scrypt_p, compression_enabled,
+                 compression_codec='zlib', compression_auto_skip=False, segment_index=None, stream_hasher=None,
+                 stream_key_salt=None):
+    """Hashes, compresses, and encrypts the file in a single pass, appending the result to processed.bin and returning
+    its manifest.  Each chunk read is hashed, then passed through the compressor and encryptor before being written, so
+    the file is only read once and no temporary files are made.  When segment_index is given, it's written to its own
+    segment file instead.  If stream_hasher is given, it's updated with all bytes written.  With compression_auto_skip,
+    files that barely compress are stored as is.
+    """
+
     manifest = {}
     # File keys:
     # fn = file name
@@ -52,50 +130,63 @@ def process_file(file_abs_path, payload_directory, crypto_key, scrypt_n, scrypt_
     # rh = raw file hash
     # ps = processed file size (only if compression or crypto)
     # ph = processed file hash (only if compression or crypto)
+    # c = compression codec (only if compression is enabled and the file isn't compressed with zlib)
 
     file_name = file_abs_path.name
     manifest['fn'] = file_name
     logging.info(f'Found: {file_name}')
-    raw_file_size = file_abs_path.stat().st_size
-    manifest['rs'] = raw_file_size
-    raw_file_hash = get_hash_from_file(file_abs_path)
-    manifest['rh'] = raw_file_hash
+    manifest['rs'] = file_abs_path.stat().st_size
 
-    if compression_enabled or crypto_key:
-
-        if compression_enabled:
-            compressed_file_path = payload_directory / 'temp_compressed.bin'
-            compress_file(file_abs_path, compressed_file_path, 'write', remove_input=False)
-            active_processing_path = compressed_file_path
-        if crypto_key:
-            encrypted_file_path = payload_directory / 'temp_encrypted.bin'
-            if compression_enabled:
-                encrypt_file(compressed_file_path, encrypted_file_path, 'write', crypto_key, scrypt_n, scrypt_r,
-                             scrypt_p, remove_input=True)
-            else:
-                encrypt_file(file_abs_path, encrypted_file_path, 'write', crypto_key, scrypt_n, scrypt_r, scrypt_p,
-                             remove_input=False)
-            active_processing_path = encrypted_file_path
-
-        processed_file_size = active_processing_path.stat().st_size
-        processed_file_hash = get_hash_from_file(active_processing_path)
-        manifest['ps'] = processed_file_size
-        manifest['ph'] = processed_file_hash
+    if segment_index is not None:
+        stream_payload_write_path = payload_directory / f'segment {segment_index}.bin'
     else:
-        active_processing_path = file_abs_path
-
-    stream_payload_write_path = payload_directory / 'processed.bin'
+        stream_payload_write_path = payload_directory / 'processed.bin'
+
+    raw_hasher = hashlib.sha256()
+    processed_hasher = hashlib.sha256()
+    processed_file_size = 0
+    if compression_enabled:
+        if compression_auto_skip and not is_compression_worthwhile(file_abs_path, compression_codec):
+            logging.info(f'{file_name} is not compressible, storing as is.')
+            compression_codec = 'none'
+    compressor = return_compressor(compression_codec) if compression_enabled and compression_codec != 'none' \
+        else None
+    encryptor = StreamEncryptor(crypto_key, scrypt_n, scrypt_r, scrypt_p, stream_key_salt) if crypto_key else None
 
     with open(stream_payload_write_path, 'ab') as byte_write:
-        with open(active_processing_path, 'rb') as byte_read:
+
+        def write_processed(processed_bytes):
+            nonlocal processed_file_size
+            if processed_bytes:
+                byte_write.write(processed_bytes)
+                processed_hasher.update(processed_bytes)
+                processed_file_size += len(processed_bytes)
+                if stream_hasher:
+                    stream_hasher.update(processed_bytes)
+
+        with open(file_abs_path, 'rb') as byte_read:
             chunk_size = 1000000
             while True:
                 chunk = byte_read.read(chunk_size)
-                if chunk:
-                    byte_write.write(chunk)
-                else:
+                if not chunk:
                     break
+                raw_hasher.update(chunk)
+                if compressor:
+                    chunk = compressor.compress(chunk)
+                if encryptor:
+                    chunk = encryptor.update(chunk)
+                write_processed(chunk)
+
+        remaining_bytes = compressor.flush() if compressor else b''
+        if encryptor:
+            remaining_bytes = encryptor.update(remaining_bytes) + encryptor.finalize()
+        write_processed(remaining_bytes)
+
+    manifest['rh'] = raw_hasher.hexdigest()
     if compression_enabled or crypto_key:
-        os.remove(active_processing_path)
+        manifest['ps'] = processed_file_size
+        manifest['ph'] = processed_hasher.hexdigest()
+    if compression_enabled and compression_codec != 'zlib':
+        manifest['c'] = compression_codec
 
     return manifest
@@ -1,10 +1,12 @@
+import hashlib
 import logging
+import os
 from pathlib import Path
 import time
 
 from bitglitter.config.configmodels import CurrentJobState
+from bitglitter.utilities.cryptography import derive_stream_key, ENCRYPTION_VERSION
 from bitglitter.utilities.display import humanize_file_size
-from bitglitter.utilities.cryptography import get_hash_from_file
 from bitglitter.utilities.filemanipulation import refresh_directory, return_file_size
 from bitglitter.write.preprocess.fileprocess import directory_crawler, process_file
 
@@ -15,22 +17,37 @@ class PreProcessor:
     processed such as stream size and hash, that will be added into the headers.
     """
 
-    def __init__(self, working_directory, input_path, crypto_key, compression_enabled, scrypt_n, scrypt_r, scrypt_p):
+    def __init__(self, working_directory, input_path, crypto_key, compression_enabled, scrypt_n, scrypt_r, scrypt_p,
+                 max_cpu_cores=1, compression_codec='zlib', compression_auto_skip=False):
         self.datetime_started = int(time.time())
         self.active_folder = refresh_directory(working_directory)
         self.encryption_enabled = True if crypto_key else False
         logging.info("Preprocess initializing...")
 
+        # scrypt is only ran once for the stream, and each file's key is derived from this.  It's derived here so worker
+        # processes inherit the cached key rather than deriving it again.
+        stream_key_salt = None
+        if crypto_key:
+            stream_key_salt = os.urandom(16)
+            derive_stream_key(crypto_key, stream_key_salt, scrypt_n, scrypt_r, scrypt_p)
+
+        # The stream hash is taken as processed.bin is written, rather than reading it again afterwards.
+        stream_hasher = hashlib.sha256()
         input_path = Path(input_path)
         if input_path.is_file():
             self.manifest = process_file(input_path, working_directory, crypto_key, scrypt_n, scrypt_r,
-                                         scrypt_p, compression_enabled)
+                                         scrypt_p, compression_enabled, compression_codec, compression_auto_skip,
+                                         stream_hasher=stream_hasher, stream_key_salt=stream_key_salt)
         else:
             self.manifest = directory_crawler(input_path, working_directory, compression_enabled, crypto_key,
-                                              scrypt_n, scrypt_r, scrypt_p)
+                                              scrypt_n, scrypt_r, scrypt_p, max_cpu_cores, stream_hasher,
+                                              compression_codec, compression_auto_skip, stream_key_salt)
+        if stream_key_salt:
+            self.manifest['ks'] = stream_key_salt.hex()  # Stream key salt, the same for all files
+            self.manifest['ev'] = ENCRYPTION_VERSION  # Encrypted file format, version 1 if missing
 
         self.processed_binary_path = working_directory / 'processed.bin'
-        self.stream_sha256 = get_hash_from_file(self.processed_binary_path)
+        self.stream_sha256 = stream_hasher.hexdigest()
         logging.info(f"Stream SHA-256 Hash: {self.stream_sha256}")
         CurrentJobState.new_task(self.stream_sha256)
         self.size_in_bytes = return_file_size(self.processed_binary_path)
@@ -6,53 +6,52 @@ import logging
 import zlib
 
 from bitglitter.utilities.compression import compress_bytes
-from bitglitter.utilities.cryptography import encrypt_bytes, get_sha256_hash_from_bytes
+from bitglitter.utilities.cryptography import encrypt_bytes, encrypt_header_bytes, get_sha256_hash_from_bytes
 
 
-def calibrator_header_render(image, block_height, block_width, pixel_width, initializer_palette_dict,
-                             initializer_palette_dict_b):
+def calibrator_header_render(image, block_height, block_width, pixel_width, initializer_color_table,
+                             initializer_color_table_b):
     """This creates the checkboard-like pattern along the top and left of the first frame of video streams, and every
     frame of image streams.  This is what the reader uses to initially lock onto the frame.  Stream block_width and
     block_height are encoded into this pattern, using alternating color palettes so no two repeating values produce a
-    continuous block of color, interfering with the frame lock process."""
+    continuous block of color, interfering with the frame lock process.  Colors come from the initializer palettes'
+    color tables, which are already in BGR order."""
 
     cv2.rectangle(image, (0, 0), (pixel_width - 1, pixel_width - 1), (0, 0, 0), -1)
 
     block_width_encoded = BitArray(uint=block_width, length=block_width - 1)
     block_width_encoded.reverse()
-    readable_block_width = ConstBitStream(block_width_encoded)
 
     for i in range(block_width - 1):
-        next_bit = readable_block_width.read('bits : 1')
+        next_bit = int(block_width_encoded[i])
 
         if i % 2 == 0:
-            color_value = initializer_palette_dict_b.get_color(ConstBitStream(next_bit))
+            color_value = initializer_color_table_b[next_bit]
 
         else:
-            color_value = initializer_palette_dict.get_color(ConstBitStream(next_bit))
+            color_value = initializer_color_table[next_bit]
 
         cv2.rectangle(image,
                       (pixel_width * i + pixel_width, 0),
                       (pixel_width * (i + 1) - 1 + pixel_width, pixel_width - 1),
-                      (color_value[2], color_value[1], color_value[0]), -1)
+                      color_value.tolist(), -1)
 
     block_height_encoded = BitArray(uint=block_height, length=block_height - 1)
     block_height_encoded.reverse()
-    readable_block_height = ConstBitStream(block_height_encoded)
 
     for i in range(block_height - 1):
-        next_bit = readable_block_height.read('bits : 1')
+        next_bit = int(block_height_encoded[i])
 
         if i % 2 == 0:
-            color_value = initializer_palette_dict_b.get_color(ConstBitStream(next_bit))
+            color_value = initializer_color_table_b[next_bit]
 
         else:
-            color_value = initializer_palette_dict.get_color(ConstBitStream(next_bit))
+            color_value = initializer_color_table[next_bit]
 
         cv2.rectangle(image,
                       (0, pixel_width * i + pixel_width),
                       (pixel_width - 1, pixel_width * (i + 1) - 1 + pixel_width),
-                      (color_value[2], color_value[1], color_value[0]), -1)
+                      color_value.tolist(), -1)
 
     return image
 
@@ -152,7 +151,12 @@ def metadata_header_encode(file_mask_enabled, crypto_key, scrypt_n, scrypt_r, sc
 
     if file_mask_enabled and crypto_key:
         logging.debug('Encrypting metadata header...')
-        processed_header_bytes = encrypt_bytes(processed_header_bytes, crypto_key, scrypt_n, scrypt_r, scrypt_p)
+        # The header's key is derived from the stream key, so scrypt isn't ran again just for the header
+        if 'ks' in manifest:
+            processed_header_bytes = encrypt_header_bytes(processed_header_bytes, crypto_key,
+                                                          bytes.fromhex(manifest['ks']), scrypt_n, scrypt_r, scrypt_p)
+        else:
+            processed_header_bytes = encrypt_bytes(processed_header_bytes, crypto_key, scrypt_n, scrypt_r, scrypt_p)
 
     logging.debug('Metadata header generated.')
     logging.debug(f'Processed metadata length: {len(processed_header_bytes)}')
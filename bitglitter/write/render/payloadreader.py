@@ -0,0 +1,54 @@
+from bitstring import ConstBitStream
+
+import mmap
+import os
+
+
+class PayloadReader:
+    """Memory maps the processed payload so any frame's slice of it can be read on its own, in any order, rather than
+    reading through the payload from the start.  Nothing is loaded until it's read.
+    """
+
+    def __init__(self, payload_path):
+        self.payload_path = payload_path
+        self.file = open(payload_path, 'rb')
+        self.size_in_bytes = os.path.getsize(payload_path)
+        self.mapped_payload = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size_in_bytes \
+            else b''
+
+    def read_bits(self, bit_offset, bit_length):
+        """Returns bit_length bits of the payload starting at bit_offset."""
+
+        if not bit_length:
+            return ConstBitStream()
+        byte_start = bit_offset // 8
+        byte_end = (bit_offset + bit_length + 7) // 8
+        return ConstBitStream(bytes=self.mapped_payload[byte_start:byte_end], offset=bit_offset % 8, length=bit_length)
+
+    def close(self):
+        if self.size_in_bytes:
+            self.mapped_payload.close()
+        self.file.close()
+
+
+_payload_readers = {}
+
+
+def return_payload_reader(payload_path):
+    """Each process keeps its reader open for the payload, so it's only mapped once per process rather than per frame.
+    The reader is reopened if the payload at that path has been replaced since.
+    """
+
+    payload_path = str(payload_path)
+    payload_reader = _payload_readers.get(payload_path)
+    if payload_reader:
+        path_stat = os.stat(payload_path)
+        open_stat = os.fstat(payload_reader.file.fileno())
+        if (path_stat.st_ino, path_stat.st_size, path_stat.st_mtime_ns) == \
+                (open_stat.st_ino, open_stat.st_size, open_stat.st_mtime_ns):
+            return payload_reader
+    if payload_reader:
+        payload_reader.close()
+    payload_reader = PayloadReader(payload_path)
+    _payload_readers[payload_path] = payload_reader
+    return payload_reader
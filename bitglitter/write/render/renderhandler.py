@@ -1,12 +1,29 @@
 import logging
 from multiprocessing import cpu_count, Pool
+from threading import BoundedSemaphore, Event
 
+from bitglitter.config.config import release_connections_before_fork
 from bitglitter.config.palettefunctions import _return_palette
 from bitglitter.utilities.filemanipulation import create_default_output_folder
 from bitglitter.write.render.headerencode import metadata_header_encode, custom_palette_header_encode, \
     stream_header_encode
-from bitglitter.write.render.framestategenerator import frame_state_generator
-from bitglitter.write.render.renderutilities import draw_frame, total_frames_estimator
+from bitglitter.write.render.framestategenerator import frame_state_generator, plan_frame_layouts, \
+    return_render_context
+from bitglitter.write.render.renderutilities import draw_frame, render_worker_initializer, total_frames_estimator
+from bitglitter.write.render.videorender import VideoRender
+
+
+def bounded_frame_states(frame_states, frame_slots, render_stopped):
+    """Pool.imap() pulls tasks from its generator as fast as it can, and holds finished frames until every frame
+    before them is returned.  Each frame state has to claim a slot before it's handed to the pool, and slots are freed
+    as frames are written, which caps how many frames are in flight (and held in memory) at once.
+    """
+
+    for frame_state in frame_states:
+        while not frame_slots.acquire(timeout=1):
+            if render_stopped.is_set():
+                return
+        yield frame_state
 
 
 class RenderHandler:
@@ -25,7 +42,8 @@ class RenderHandler:
                  datetime_started, bg_version, manifest, protocol_version,
 
                  # Render Output
-                 output_mode, output_path, stream_name_file_output,
+                 output_mode, output_path, stream_name_file_output, frames_per_second, video_codec, video_crf,
+                 video_bitrate, video_gop,
 
                  # Statistics
                  save_statistics
@@ -42,10 +60,6 @@ class RenderHandler:
         initializer_palette_b = _return_palette('11')
         stream_palette = _return_palette(palette_id=stream_palette_id)
 
-        initializer_palette_dict = initializer_palette.return_encoder()
-        initializer_palette_dict_b = initializer_palette_b.return_encoder()
-        stream_palette_dict = stream_palette.return_encoder()
-
         metadata_header_bytes, metadata_header_hash_bytes = metadata_header_encode(file_mask_enabled, crypto_key,
                                                                                    scrypt_n, scrypt_r, scrypt_p,
                                                                                    bg_version, stream_name,
@@ -59,11 +73,22 @@ class RenderHandler:
         self.total_frames = total_frames_estimator(block_height, block_width, len(metadata_header_bytes),
                                                    len(palette_header_bytes), size_in_bytes, stream_palette,
                                                    output_mode)
+        self.total_operations = self.total_frames
 
         stream_header = stream_header_encode(size_in_bytes, self.total_frames, compression_enabled,
                                              encryption_enabled, file_mask_enabled, len(metadata_header_bytes),
                                              metadata_header_hash_bytes, len(palette_header_bytes),
                                              palette_header_hash_bytes)
+
+        render_context = return_render_context(block_height, block_width, pixel_width, protocol_version,
+                                               initializer_palette, initializer_palette_b, stream_palette,
+                                               output_mode, output_path, stream_name_file_output, working_dir,
+                                               self.total_frames, stream_header, metadata_header_bytes,
+                                               palette_header_bytes, stream_sha256, default_output_path, stream_name,
+                                               save_statistics, self.total_operations)
+        frame_layouts = plan_frame_layouts(block_height, block_width, output_mode, stream_palette.bit_length,
+                                           render_context['setup_headers_bits'].len,
+                                           render_context['payload_path'].stat().st_size * 8)
         logging.info('Pre-render complete.')
 
         #  Render
@@ -72,19 +97,32 @@ class RenderHandler:
         else:
             pool_size = max_cpu_cores
 
-        self.total_operations = self.total_frames * (1 + int(output_mode != 'image'))
+        frame_slots = BoundedSemaphore(pool_size * 2)
+        render_stopped = Event()
 
-        with Pool(processes=pool_size) as worker_pool:
+        # The render context is sent to each worker once as it starts, so frames are only sent as their layouts.
+        release_connections_before_fork()
+        with Pool(processes=pool_size, initializer=render_worker_initializer, initargs=(render_context,)) as \
+                worker_pool:
             logging.info(f'Beginning rendering on {pool_size} CPU core(s)...')
 
-            for frame_encode in worker_pool.imap(draw_frame,
-                                                 frame_state_generator(block_height, block_width, pixel_width,
-                                                 protocol_version, initializer_palette, stream_palette, output_mode,
-                                                 output_path, stream_name_file_output, working_dir, self.total_frames,
-                                                 stream_header, metadata_header_bytes, palette_header_bytes,
-                                                 stream_sha256, initializer_palette_dict, initializer_palette_dict_b,
-                                                 stream_palette_dict, default_output_path, stream_name,
-                                                 save_statistics, self.total_operations), chunksize=1):
-                pass
+            # Opened after the workers are started, so they don't inherit the ffmpeg pipe and hold it open.
+            video_render = None
+            if output_mode == 'video':
+                video_render = VideoRender(output_path, stream_name_file_output, stream_sha256, stream_name,
+                                           block_width, block_height, pixel_width, frames_per_second,
+                                           self.total_frames, video_codec, video_crf, video_bitrate, video_gop)
+
+            frame_states = frame_state_generator(frame_layouts, self.total_frames)
+            try:
+                for frame_image in worker_pool.imap(draw_frame, bounded_frame_states(frame_states, frame_slots,
+                                                                                     render_stopped), chunksize=1):
+                    if video_render:
+                        video_render.write_frame(frame_image)
+                    frame_slots.release()
+            finally:
+                render_stopped.set()
+                if video_render:
+                    video_render.release()
 
         logging.info('Rendering frames complete.')
@@ -1,4 +1,4 @@
-from bitstring import ConstBitStream
+from bitstring import BitStream, ConstBitStream
 import cv2
 import numpy
 
@@ -6,7 +6,10 @@ import logging
 import math
 from pathlib import Path
 
-from bitglitter.write.render.headerencode import calibrator_header_render
+from bitglitter.config.config import database_worker_initializer
+from bitglitter.utilities.bitpacking import bits_to_rgb, bits_to_symbols, bitstream_to_bits
+from bitglitter.write.render.headerencode import calibrator_header_render, frame_header_encode
+from bitglitter.write.render.payloadreader import return_payload_reader
 
 
 def total_frames_estimator(block_height, block_width, metadata_header_length, palette_header_length, size_in_bytes,
@@ -61,85 +64,149 @@ def render_coords_generator(block_height, block_width, pixel_width, initializer_
                    (pixel_width * int(initializer_enabled)) + (pixel_width * (y_range + 1) - 1))
 
 
-def draw_frame(dict_obj):
-    """Unpacking dictionary object into variables for easier reading of function.  A single argument must be passed
-    here because multiprocessing's imap requires it.
+def assemble_frame_payload(frame_layout, initializer_bits, setup_headers_bits, payload_reader):
+    """Builds the complete bits of a frame from its layout: the initializer (if enabled), the frame header, any setup
+    headers, its slice of the payload, and the padding on the last frame.
     """
 
-    block_height = dict_obj['block_height']
-    block_width = dict_obj['block_width']
-    pixel_width = dict_obj['pixel_width']
-    frame_payload = dict_obj['frame_payload']
-    initializer_palette_blocks_used = dict_obj['initializer_palette_blocks_used']
-    stream_palette_dict = dict_obj['stream_palette_dict']
-    stream_palette_bit_length = dict_obj['stream_palette_bit_length']
-    initializer_palette_dict = dict_obj['initializer_palette_dict']
-    initializer_palette_dict_b = dict_obj['initializer_palette_dict_b']
-    initializer_palette = dict_obj['initializer_palette']
-    output_mode = dict_obj['output_mode']
-    stream_name_file_output = dict_obj['stream_name_file_output']
-    stream_name = dict_obj['stream_name']
-    initializer_enabled = dict_obj['initializer_enabled']
-    frame_number = dict_obj['frame_number']
-    total_frames = dict_obj['total_frames']
-    image_output_path = dict_obj['image_output_path']
-    stream_sha256 = dict_obj['stream_sha256']
-    save_statistics = dict_obj['save_statistics']
-    total_operations = dict_obj['total_operations']
+    payload_bits = payload_reader.read_bits(frame_layout['payload_bit_offset'], frame_layout['payload_bit_length'])
+    padding_bits = BitStream(bin=f"{'0' * frame_layout['padding_bit_length']}")
 
-    percentage_string = f'{round(((frame_number / total_operations) * 100), 2):.2f}'
-    logging.info(f'Generating {frame_number} of {total_frames}... {percentage_string} %')
+    frame_hashable_bits = BitStream(setup_headers_bits + payload_bits)
+    frame_hashable_bits.append(padding_bits)
+    frame_header_holder = frame_header_encode(frame_hashable_bits.tobytes(), frame_hashable_bits.len,
+                                              frame_layout['frame_number'])
 
-    image = numpy.zeros((pixel_width * block_height, pixel_width * block_width, 3), dtype='uint8')
+    merged_pieces = (initializer_bits if initializer_bits else BitStream()) + frame_header_holder + \
+        setup_headers_bits + payload_bits + padding_bits
+    return ConstBitStream(merged_pieces)
 
-    if initializer_enabled:
-        image = calibrator_header_render(image, block_height, block_width, pixel_width, initializer_palette_dict,
-                                         initializer_palette_dict_b)
 
-    next_coordinates = render_coords_generator(block_height, block_width, pixel_width, initializer_enabled)
-    block_position = 0
-    while len(frame_payload) != frame_payload.bitpos:
+def bits_to_block_colors(bit_array, bit_length, color_table):
+    """Returns the BGR color of each block carried by a flat bit array.  24 bit palettes have no color table, since each
+    block's bits are the red/green/blue channels directly.
+    """
 
-        # Primary palette selection (ie, header_palette or stream_palette depending on where we are in the stream)
-        if block_position >= initializer_palette_blocks_used:
-            active_palette_dict, bit_read_length = stream_palette_dict, stream_palette_bit_length
+    if color_table is None:
+        return bits_to_rgb(bit_array)[:, ::-1]
+    return color_table[bits_to_symbols(bit_array, bit_length)]
 
-        # Initializer palette selection
-        elif block_position < initializer_palette_blocks_used:
-            active_palette_dict, bit_read_length = (initializer_palette_dict, initializer_palette.bit_length)
 
-        # Here to signal something has broken.
-        else:
-            raise RuntimeError('Something has gone wrong in matching block position to palette.  This state'
-                               '\nis reached only if something is broken.')
+def frame_payload_to_block_colors(frame_payload, initializer_palette_blocks_used, initializer_bit_length,
+                                  initializer_color_table, stream_bit_length, stream_color_table):
+    """Converts the complete payload of a frame into the colors of its blocks, in the order they are drawn.  The first
+    initializer_palette_blocks_used blocks use the initializer palette, and everything after uses the stream palette.
+    """
 
-        # This is loading the next bit(s) to be written in the frame, and then converting it to an RGB value.
-        next_bits = frame_payload.read(f'bits : {bit_read_length}')
-        color_value = active_palette_dict.get_color(ConstBitStream(next_bits))
+    bit_array = bitstream_to_bits(frame_payload)
+    initializer_bit_count = initializer_palette_blocks_used * initializer_bit_length
 
-        # With the color loaded, we'll get the coordinates of the next block (top left + bottom corner), and draw it in.
-        block_coordinates = next(next_coordinates)
-        cv2.rectangle(image, (block_coordinates[0], block_coordinates[1]), (block_coordinates[2], block_coordinates[3]),
-                      (color_value[2], color_value[1], color_value[0]), -1)
-        block_position += 1
+    initializer_colors = bits_to_block_colors(bit_array[:initializer_bit_count], initializer_bit_length,
+                                              initializer_color_table)
+    stream_colors = bits_to_block_colors(bit_array[initializer_bit_count:], stream_bit_length, stream_color_table)
+    return numpy.concatenate((initializer_colors, stream_colors))
 
-    # Frames get saved as .png files.
-    frame_number_to_string = str(frame_number)
 
-    if output_mode == 'video':
-        file_name = frame_number_to_string
+def rasterize_blocks(image, block_colors, block_height, block_width, pixel_width, initializer_enabled):
+    """Draws all blocks of the frame in one pass.  Block colors are laid out on the block grid (left to right, top to
+    bottom, the same order as render_coords_generator()), and then each block is scaled up to pixel_width.  Blocks
+    without a color stay black, same as an untouched frame.
+    """
+
+    offset = int(initializer_enabled)
+    grid_height = block_height - offset
+    grid_width = block_width - offset
+
+    block_grid = numpy.zeros((grid_height * grid_width, 3), dtype=numpy.uint8)
+    block_grid[:len(block_colors)] = block_colors
+    block_grid = block_grid.reshape(grid_height, grid_width, 3)
+
+    image[offset * pixel_width:, offset * pixel_width:] = numpy.repeat(numpy.repeat(block_grid, pixel_width, axis=0),
+                                                                      pixel_width, axis=1)
+    return image
+
+
+_render_context = {}
+
+
+def render_worker_initializer(render_context):
+    """Ran once as each render worker starts.  It keeps the stream's render context for every frame that worker draws,
+    and renders the calibrator onto a blank frame once so frames with the initializer can start from a copy of it.
+    """
 
+    database_worker_initializer()
+    _render_context.clear()
+    _render_context.update(render_context)
+
+    pixel_width = render_context['pixel_width']
+    block_height = render_context['block_height']
+    block_width = render_context['block_width']
+    blank_frame = numpy.zeros((pixel_width * block_height, pixel_width * block_width, 3), dtype='uint8')
+    _render_context['blank_frame'] = blank_frame
+    _render_context['calibrated_frame'] = calibrator_header_render(blank_frame.copy(), block_height, block_width,
+                                                                   pixel_width,
+                                                                   render_context['initializer_color_table'],
+                                                                   render_context['initializer_color_table_b'])
+
+
+def draw_frame(frame_layout):
+    """Renders a single frame from its layout, using the render context the worker was started with.  A single
+    argument must be passed here because multiprocessing's imap requires it.
+    """
+
+    block_height = _render_context['block_height']
+    block_width = _render_context['block_width']
+    pixel_width = _render_context['pixel_width']
+    initializer_bits = _render_context['initializer_bits']
+    setup_headers_bits = _render_context['setup_headers_bits']
+    payload_path = _render_context['payload_path']
+    initializer_bit_length = _render_context['initializer_bit_length']
+    initializer_color_table = _render_context['initializer_color_table']
+    stream_bit_length = _render_context['stream_bit_length']
+    stream_color_table = _render_context['stream_color_table']
+    output_mode = _render_context['output_mode']
+    stream_name_file_output = _render_context['stream_name_file_output']
+    stream_name = _render_context['stream_name']
+    total_frames = _render_context['total_frames']
+    image_output_path = _render_context['image_output_path']
+    stream_sha256 = _render_context['stream_sha256']
+    save_statistics = _render_context['save_statistics']
+    total_operations = _render_context['total_operations']
+
+    frame_number = frame_layout['frame_number']
+    initializer_enabled = frame_layout['initializer_enabled']
+    initializer_palette_blocks_used = frame_layout['initializer_palette_blocks_used']
+
+    percentage_string = f'{round(((frame_number / total_operations) * 100), 2):.2f}'
+    logging.info(f'Generating {frame_number} of {total_frames}... {percentage_string} %')
+
+    # Each frame's slice of the payload is read straight from processed.bin, rather than passed in from the parent.
+    setup_headers_bit_offset = frame_layout['setup_headers_bit_offset']
+    frame_setup_headers_bits = setup_headers_bits[setup_headers_bit_offset:setup_headers_bit_offset +
+                                                  frame_layout['setup_headers_bit_length']]
+    frame_payload = assemble_frame_payload(frame_layout, initializer_bits if initializer_enabled else None,
+                                           frame_setup_headers_bits, return_payload_reader(payload_path))
+
+    if initializer_enabled:
+        image = _render_context['calibrated_frame'].copy()
     else:
+        image = _render_context['blank_frame'].copy()
+
+    # The whole frame payload is converted into block colors at once, and then scaled up into the image.
+    block_colors = frame_payload_to_block_colors(frame_payload, initializer_palette_blocks_used,
+                                                 initializer_bit_length, initializer_color_table, stream_bit_length,
+                                                 stream_color_table)
+    rasterize_blocks(image, block_colors, block_height, block_width, pixel_width, initializer_enabled)
+    block_position = len(block_colors)
+
+    # Video frames are returned to be written into the video in order, while images get saved as .png files.
+    if output_mode == 'image':
         if stream_name_file_output:
             file_name = stream_name + ' - ' + str(frame_number)
         else:
             file_name = stream_sha256 + ' - ' + str(frame_number)
 
-    # save_path = Path(image_output_path / f'{str(file_name)}.png')
-    cv2.imwrite(str(Path(image_output_path / f'{str(file_name)}.png')), image)
-
-    # Ensure every bit in payload is accounted for.
-    assert frame_payload.len == frame_payload.bitpos
+        cv2.imwrite(str(Path(image_output_path / f'{str(file_name)}.png')), image)
 
     if save_statistics:
         from bitglitter.config.configfunctions import write_stats_update
@@ -148,3 +215,6 @@ def draw_frame(dict_obj):
         else:
             blocks_wrote = block_position
         write_stats_update(blocks_wrote, 1, frame_payload.len)
+
+    if output_mode == 'video':
+        return image
@@ -2,32 +2,115 @@ import cv2
 
 import logging
 from pathlib import Path
+import shutil
+import subprocess
 
 
-def render_video(output_path, stream_name_file_output, working_directory, total_frames,
-                 frames_per_second, stream_sha256, block_width, block_height, pixel_width, stream_name,
-                 total_operations):
-    """Taking in whichever arguments, it takes all of the rendered frames, and merges them into an .mp4 ."""
+# Codecs available for video output.  Codecs with a fourcc can be written by OpenCV directly, while those without one
+# need an ffmpeg binary on the system.  Lossless codecs reproduce every frame exactly as rendered.
+VIDEO_CODECS = {
+    'mp4v': {'extension': '.mp4', 'fourcc': 'mp4v', 'ffmpeg_arguments': ['-c:v', 'mpeg4', '-pix_fmt', 'yuv420p'],
+             'lossless': False},
+    'mjpeg': {'extension': '.avi', 'fourcc': 'MJPG', 'ffmpeg_arguments': ['-c:v', 'mjpeg', '-pix_fmt', 'yuvj444p'],
+              'lossless': False},
+    'ffv1': {'extension': '.avi', 'fourcc': 'FFV1', 'ffmpeg_arguments': ['-c:v', 'ffv1', '-level', '3'],
+             'lossless': True},
+    'huffyuv': {'extension': '.avi', 'fourcc': 'HFYU', 'ffmpeg_arguments': ['-c:v', 'huffyuv', '-pix_fmt', 'rgb24'],
+                'lossless': True},
+    'x264': {'extension': '.mp4', 'fourcc': None, 'ffmpeg_arguments': None, 'lossless': False},
+}
 
-    logging.info('Rendering video...')
 
-    if stream_name_file_output:
-        video_name = stream_name
-    else:
-        video_name = stream_sha256
+def is_lossless_codec(video_codec, video_crf):
+    """x264 is lossless only at a CRF of 0, which is what it defaults to."""
+    if video_codec == 'x264':
+        return not video_crf
+    return VIDEO_CODECS[video_codec]['lossless']
 
-    frame_size = (block_width * pixel_width, block_height * pixel_width)
-    save_path = f"{Path(output_path / video_name)}.mp4"
 
-    # This needs to be tuned- consistently very large files
-    output = cv2.VideoWriter(str(save_path), cv2.VideoWriter.fourcc(*'mp4v'), frames_per_second, frame_size)
+def return_x264_arguments(video_crf, video_bitrate):
+    """Lossless x264 is encoded as RGB, as converting to YUV alone is enough to shift block colors.  Lossy x264 keeps
+    full chroma resolution with yuv444p, since chroma subsampling blends neighboring blocks together.
+    """
 
-    for frame in range(total_frames):
-        percentage_string = f'{round((((frame + 1) / total_operations) * 100) + 50, 2):.2f}'
-        logging.info(f'Rendering video frame {frame + 1} of {total_frames}... {percentage_string} %')
-        image = cv2.imread(str(Path(working_directory / f'{frame + 1}.png')))
-        output.write(image)
+    if video_bitrate and video_crf is None:
+        return ['-c:v', 'libx264', '-pix_fmt', 'yuv444p']
+    if not video_crf:
+        return ['-c:v', 'libx264rgb', '-crf', '0', '-pix_fmt', 'bgr24']
+    return ['-c:v', 'libx264', '-crf', str(video_crf), '-pix_fmt', 'yuv444p']
 
-    output.release()
-    logging.info('Rendering video complete.')
-    logging.info(f'Video save path: {save_path}')
+
+class VideoRender:
+    """Frames are written into the video as they are rendered, in frame order, so no intermediate images are saved.
+    Depending on the codec and settings, frames go either to OpenCV's VideoWriter or are piped into ffmpeg.
+    """
+
+    def __init__(self, output_path, stream_name_file_output, stream_sha256, stream_name, block_width, block_height,
+                 pixel_width, frames_per_second, total_frames, video_codec='mp4v', video_crf=None, video_bitrate=None,
+                 video_gop=None):
+
+        if stream_name_file_output:
+            video_name = stream_name
+        else:
+            video_name = stream_sha256
+
+        self.total_frames = total_frames
+        self.frames_wrote = 0
+        self.output = None
+        self.ffmpeg_process = None
+
+        ffmpeg_path = shutil.which('ffmpeg')
+        needs_ffmpeg = VIDEO_CODECS[video_codec]['fourcc'] is None or video_crf is not None or video_bitrate \
+            or video_gop
+        if needs_ffmpeg and not ffmpeg_path:
+            if VIDEO_CODECS[video_codec]['fourcc'] is None:
+                logging.warning(f'ffmpeg was not found on this system, which {video_codec} requires.  Falling back to'
+                                f' mp4v...')
+                video_codec = 'mp4v'
+            else:
+                logging.warning('ffmpeg was not found on this system, video_crf, video_bitrate, and video_gop will be'
+                                ' ignored.')
+            needs_ffmpeg = False
+
+        self.save_path = f"{Path(output_path / video_name)}{VIDEO_CODECS[video_codec]['extension']}"
+        frame_size = (block_width * pixel_width, block_height * pixel_width)
+        logging.info(f'Encoding video as {video_codec}' + (' through ffmpeg...' if needs_ffmpeg else '...'))
+
+        if needs_ffmpeg:
+            if video_codec == 'x264':
+                codec_arguments = return_x264_arguments(video_crf, video_bitrate)
+            else:
+                codec_arguments = VIDEO_CODECS[video_codec]['ffmpeg_arguments']
+            rate_arguments = []
+            if video_bitrate:
+                rate_arguments += ['-b:v', str(video_bitrate)]
+            if video_gop:
+                rate_arguments += ['-g', str(video_gop)]
+
+            self.ffmpeg_process = subprocess.Popen([ffmpeg_path, '-y', '-loglevel', 'error', '-f', 'rawvideo',
+                                                    '-pix_fmt', 'bgr24', '-s', f'{frame_size[0]}x{frame_size[1]}',
+                                                    '-r', str(frames_per_second), '-i', '-', *codec_arguments,
+                                                    *rate_arguments, str(self.save_path)], stdin=subprocess.PIPE)
+        else:
+            self.output = cv2.VideoWriter(str(self.save_path),
+                                          cv2.VideoWriter.fourcc(*VIDEO_CODECS[video_codec]['fourcc']),
+                                          frames_per_second, frame_size)
+
+    def write_frame(self, image):
+        self.frames_wrote += 1
+        logging.debug(f'Writing video frame {self.frames_wrote} of {self.total_frames}...')
+        if self.ffmpeg_process:
+            self.ffmpeg_process.stdin.write(image.tobytes())
+        else:
+            self.output.write(image)
+
+    def release(self):
+        if self.ffmpeg_process:
+            self.ffmpeg_process.stdin.close()
+            if self.ffmpeg_process.wait():
+                raise RuntimeError(f'ffmpeg exited with code {self.ffmpeg_process.returncode} while encoding the'
+                                   f' video.')
+        else:
+            self.output.release()
+        logging.info('Rendering video complete.')
+        logging.info(f'Video save path: {self.save_path}')
@@ -8,7 +8,6 @@ from bitglitter.utilities.loggingset import logging_setter
 from bitglitter.validation.validatewrite import write_parameter_validate
 from bitglitter.write.preprocess.preprocessor import PreProcessor
 from bitglitter.write.render.renderhandler import RenderHandler
-from bitglitter.write.render.videorender import render_video
 
 
 def write(
@@ -25,6 +24,8 @@ def write(
 
         # Stream configuration
         compression_enabled=True,
+        compression_codec='zlib',
+        compression_auto_skip=False,
         # error_correction=False, -> Pending further research for viability
 
         # Encryption
@@ -43,6 +44,10 @@ def write(
 
         # Video rendering
         frames_per_second=30,
+        video_codec='mp4v',
+        video_crf=None,
+        video_bitrate=None,
+        video_gop=None,
 
         # Logging
         logging_level='info',
@@ -76,7 +81,9 @@ def write(
     # Loading preset (if given), and validating any other parameters before continuing with the rendering process.
     if preset_nickname:
         write_parameter_validate(input_path, stream_name, stream_description, output_directory, stream_name_file_output,
-                                 file_mask_enabled, encryption_key, preset_used=True)
+                                 file_mask_enabled, encryption_key, video_codec=video_codec, video_crf=video_crf,
+                                 video_bitrate=video_bitrate, video_gop=video_gop, compression_codec=compression_codec,
+                                 compression_auto_skip=compression_auto_skip, preset_used=True)
         preset = return_preset(preset_nickname)
         output_mode = preset.output_mode
         compression_enabled = preset.compression_enabled
@@ -93,11 +100,16 @@ def write(
         write_parameter_validate(input_path, stream_name, stream_description, output_directory, stream_name_file_output,
                                  file_mask_enabled, encryption_key, max_cpu_cores, output_mode, compression_enabled,
                                  scrypt_n, scrypt_r, scrypt_p, stream_palette_id, stream_palette_nickname, pixel_width,
-                                 block_height, block_width, frames_per_second, preset_used=False)
+                                 block_height, block_width, frames_per_second, video_codec, video_crf, video_bitrate,
+                                 video_gop, compression_codec, compression_auto_skip, preset_used=False)
+
+    # Storing files as is is the same as compression being disabled, and is flagged as such in the stream header.
+    if compression_codec == 'none':
+        compression_enabled = False
 
     # This is what takes the raw input files and runs them through several processes in preparation for rendering.
     pre_processor = PreProcessor(working_directory, input_path, encryption_key, compression_enabled, scrypt_n, scrypt_r,
-                                 scrypt_p)
+                                 scrypt_p, max_cpu_cores, compression_codec, compression_auto_skip)
 
     # This is where the final steps leading up to frame generation as well as generation itself takes place.
     render_handler = RenderHandler(stream_name, stream_description, working_directory, output_directory, encryption_key,
@@ -106,13 +118,8 @@ def write(
                                    pre_processor.size_in_bytes, compression_enabled, pre_processor.encryption_enabled,
                                    file_mask_enabled, pre_processor.datetime_started, constants.BG_VERSION,
                                    pre_processor.manifest, constants.PROTOCOL_VERSION, output_mode, output_directory,
-                                   stream_name_file_output, save_statistics)
-
-    # Video render
-    if output_mode == 'video':
-        render_video(output_directory, stream_name_file_output, working_directory, render_handler.total_frames,
-                     frames_per_second, pre_processor.stream_sha256, block_width, block_height, pixel_width,
-                     stream_name, render_handler.total_operations)
+                                   stream_name_file_output, frames_per_second, video_codec, video_crf, video_bitrate,
+                                   video_gop, save_statistics)
 
     # Removing temporary files
     remove_working_folder(working_directory)
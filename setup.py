@@ -17,9 +17,9 @@ setup(
         "bitstring==3.1.9",
         "cryptography==3.4.8",
         "opencv-python==4.5.3.56",
-        "SQLAlchemy==1.4.25"
+        "SQLAlchemy>=1.4.33,<2.0"
     ],
-    extra_require={"dev": "pytest"},
+    extras_require={"dev": ["pytest"], "zstd": ["zstandard"]},
     classifiers=[
         "Programming Language :: Python :: 3.9.5",
         "License :: OSI Approved :: MIT License",